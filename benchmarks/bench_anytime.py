@@ -0,0 +1,47 @@
+"""Anytime solving: how soon usable baskets arrive compared with one blocking solve.
+
+For a few fixed profiles it runs ShoppingModel.iter_incumbents on the
+presolved bundled catalog and prints every incumbent (time, cost, gap),
+then the time and cost of a single solve with the same limit.
+
+Usage: python benchmarks/bench_anytime.py [--time-budget SECONDS] [--target-gap FRACTION]
+                                           [--backend pulp|highs]
+"""
+import argparse
+import contextlib
+import io
+import time
+
+from bench_common import PROFILES, load_skus, profile_targets
+import shopping_optimizer_v2 as so
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--time-budget", type=float, default=30)
+    parser.add_argument("--target-gap", type=float, default=None)
+    parser.add_argument("--backend", choices=so.ShoppingModel.BACKENDS, default="pulp")
+    args = parser.parse_args()
+
+    df = load_skus(presolve=True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        model = so.ShoppingModel(df, backend=args.backend)
+
+    for profile in PROFILES:
+        budget = profile[-1]
+        model.set_targets(*profile_targets(profile), budget)
+        print(f"\n{profile}")
+        for incumbent in model.iter_incumbents(args.time_budget, args.target_gap):
+            gap = f"{incumbent['gap']:.2%}" if incumbent["gap"] is not None else "-"
+            print(f"  {incumbent['seconds']:6.2f}s {incumbent['cost']:9.2f} gap={gap:>6s} ({incumbent['source']})")
+        info = model.solve_info
+        print(f"  anytime: {info['status']} in {info['seconds']:.2f}s, proven={info['proven']}")
+
+        start = time.perf_counter()
+        status = model.solve(time_limit=args.time_budget, msg=False, gap=args.target_gap)
+        cost = f"{model.extract(budget)['total_cost']:.2f}" if status == "Optimal" else "-"
+        print(f"  single solve: {time.perf_counter() - start:.2f}s cost={cost} proven={model.solve_info['proven']}")
+
+
+if __name__ == "__main__":
+    main()
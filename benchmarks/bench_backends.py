@@ -0,0 +1,51 @@
+"""Build and solve time of the PuLP/CBC and in-process HiGHS backends.
+
+Builds ShoppingModel on the presolved bundled catalog with each backend and
+solves a few fixed profiles, reporting build, solve and total time per run.
+The PuLP solve time includes writing the LP file, starting CBC and reading
+its solution back; the HiGHS backend passes the sparse matrix directly.
+
+Usage: python benchmarks/bench_backends.py [--time-limit SECONDS]
+"""
+import argparse
+import contextlib
+import io
+import time
+
+from bench_common import PROFILES, load_skus, profile_targets
+import shopping_optimizer_v2 as so
+
+
+def run(df, backend, profile, time_limit):
+    budget = profile[-1]
+    tdee, protein_g, fat_g, carb_g = profile_targets(profile)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        model = so.ShoppingModel(df, backend=backend)
+    model.set_targets(tdee, protein_g, fat_g, carb_g, budget)
+    built = time.perf_counter()
+    status = model.solve(time_limit=time_limit, msg=False)
+    solved = time.perf_counter()
+    cost = model.extract(budget)["total_cost"] if status == "Optimal" else None
+    return {"build": built - start, "solve": solved - built, "status": status, "cost": cost}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--time-limit", type=int, default=30)
+    args = parser.parse_args()
+
+    df = load_skus(presolve=True)
+    print(f"Catalog: {len(df)} products after presolve ({2 * len(df)} variables)")
+
+    for profile in PROFILES:
+        print(f"\n{profile}")
+        for backend in so.ShoppingModel.BACKENDS:
+            result = run(df, backend, profile, args.time_limit)
+            cost = f"{result['cost']:.2f}" if result["cost"] is not None else "-"
+            print(f"  {backend:5s} build={result['build']:6.2f}s solve={result['solve']:6.2f}s "
+                  f"total={result['build'] + result['solve']:6.2f}s status={result['status']} cost={cost}")
+
+
+if __name__ == "__main__":
+    main()
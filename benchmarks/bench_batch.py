@@ -0,0 +1,80 @@
+"""JSONL batch mode against one CLI process per profile.
+
+Draws --users random profiles (fixed seed, the population of
+bench_solution_cache.py), writes them to a temporary JSONL file and times
+shopping_optimizer_v2.py --batch on it against running the CLI once per
+profile with --profile. Both use --fast unless --exact is given. It also
+reports when the first result line arrived and checks that both ways give
+the same basket costs. The per-profile runs rewrite shopping_output.txt.
+
+Usage: python benchmarks/bench_batch.py [--users 20] [--workers 1] [--exact] [--backend pulp|highs]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_solution_cache import population
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shopping_optimizer_v2.py")
+REPO = os.path.dirname(SCRIPT)
+
+
+def run_batch(path, options):
+    """(seconds, seconds to the first result, {line: cost})"""
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, SCRIPT, "--batch", path, *options], stdout=subprocess.PIPE,
+                            stderr=subprocess.DEVNULL, cwd=REPO, text=True)
+    first, costs = None, {}
+    for line in proc.stdout:
+        first = first or time.perf_counter() - start
+        record = json.loads(line)
+        # Rounded to the cent, as the CLI prints it
+        costs[record["line"]] = round(record["results"]["total_cost"], 2) if record.get("results") else None
+    proc.wait()
+    return time.perf_counter() - start, first, costs
+
+
+def run_each(profiles, options):
+    """(seconds, {line: cost}) running the CLI once per profile"""
+    start = time.perf_counter()
+    costs = {}
+    for number, profile in enumerate(profiles, 1):
+        output = subprocess.run([sys.executable, SCRIPT, "--profile", json.dumps(profile), *options],
+                                capture_output=True, cwd=REPO, text=True).stdout
+        cost = [line for line in output.splitlines() if "Total Cost:" in line]
+        costs[number] = float(cost[0].split()[3]) if cost else None
+    return time.perf_counter() - start, costs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=1, help="solver processes for --batch")
+    parser.add_argument("--exact", action="store_true", help="solve the exact MIP instead of --fast")
+    parser.add_argument("--backend", choices=["pulp", "highs"], default="pulp")
+    args = parser.parse_args()
+
+    profiles = list(population(args.users, args.seed))
+    options = ["--quiet", "--backend", args.backend] + ([] if args.exact else ["--fast"])
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "profiles.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(profile) + "\n" for profile in profiles)
+        batch_seconds, first, batch_costs = run_batch(path, options + ["--workers", str(args.workers)])
+    each_seconds, each_costs = run_each(profiles, options)
+
+    print(f"{len(profiles)} profiles, {'exact' if args.exact else 'fast'} solves on {args.backend}")
+    print(f"  --batch ({args.workers} workers) {batch_seconds:7.2f}s  {len(profiles) / batch_seconds:6.2f} profiles/s  "
+          f"first result after {first:.2f}s")
+    print(f"  one process each   {each_seconds:7.2f}s  {len(profiles) / each_seconds:6.2f} profiles/s")
+    differ = sum(batch_costs.get(number) != cost for number, cost in each_costs.items())
+    print(f"  costs differ for {differ} of {len(profiles)} profiles")
+
+
+if __name__ == "__main__":
+    main()
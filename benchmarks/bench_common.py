@@ -0,0 +1,66 @@
+"""Catalog and profile setup shared by the benchmarks.
+
+Importing this module puts the repository root on sys.path, so a benchmark
+can import shopping_optimizer_v2 right after it. It holds the bundled
+catalog's path, the fixed reference profiles, their nutrition targets, the
+canonical SKU frame every solve benchmark starts from and the synthetic
+scaled catalogs the stage and memory benchmarks time.
+"""
+import contextlib
+import io
+import os
+import sys
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, REPO_DIR)
+
+import numpy as np
+import pandas as pd
+
+import shopping_optimizer_v2 as so
+
+CSV_PATH = os.path.join(REPO_DIR, "enriched_2025_05_21.csv")
+
+PROFILES = [
+    # (age, gender, weight, height, activity, goal, budget)
+    (30, "male", 75, 180, "sedentary", "being healthy", 3000),
+    (25, "female", 60, 165, "lightly active", "being healthy", 3000),
+    (40, "female", 70, 170, "sedentary", "losing weight", 4000),
+]
+
+
+def profile_targets(profile):
+    """(tdee, protein_g, fat_g, carb_g) of a PROFILES tuple"""
+    age, gender, weight, height, activity, goal, _ = profile
+    return so.get_macro_targets(so.calculate_tdee(age, gender, weight, height, activity), goal)
+
+
+def load_skus(path=CSV_PATH, compact=False, presolve=False):
+    """Canonical SKU frame of a catalog CSV, preprocessed in memory (no catalog cache)"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        df, _ = so.canonicalize_products(so.preprocess_data(pd.read_csv(path)))
+        if compact:
+            df = so.compact_catalog(df)
+        if presolve:
+            df, _ = so.presolve_dominated(df)
+    return df
+
+
+def write_scaled_csv(path, scale, seed=0):
+    """Write the bundled CSV repeated scale times as distinct products.
+
+    Every copy after the first gets a numbered name suffix and prices
+    jittered by up to +/-15% (fixed seed).
+    """
+    raw = pd.read_csv(CSV_PATH, dtype=str, keep_default_na=False)
+    prices = pd.to_numeric(raw["price"].str.replace(" TL", "", regex=False)
+                           .str.replace(".", "", regex=False).str.replace(",", ".", regex=False),
+                           errors="coerce")
+    rng = np.random.default_rng(seed)
+    for copy in range(scale):
+        chunk = raw.copy()
+        if copy:
+            chunk["name"] = chunk["name"] + f" #{copy}"
+            jittered = prices * rng.uniform(0.85, 1.15, len(prices))
+            chunk["price"] = jittered.map(lambda p: f"{p:.2f}".replace(".", ",") + " TL" if p == p else "")
+        chunk.to_csv(path, mode="w" if copy == 0 else "a", header=copy == 0, index=False)
@@ -0,0 +1,80 @@
+"""Memory of the full canonical-SKU catalog against its compact form.
+
+For the bundled catalog and synthetic copies scaled 10x, ... (see
+bench_common.write_scaled_csv) it reports the deep memory footprint of the
+canonical SKU and offers frames before and after compact_catalog, the time to
+build and presolve a ShoppingModel from each, and, with --solve, the basket
+cost for a few fixed profiles on both to show the compact frame changes
+nothing.
+
+Usage: python benchmarks/bench_compact.py [--scales 1,10] [--solve] [--backend pulp|highs]
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from bench_common import CSV_PATH, PROFILES, profile_targets, write_scaled_csv
+import shopping_optimizer_v2 as so
+
+
+def mb(nbytes):
+    return f"{nbytes / 1e6:7.2f} MB"
+
+
+def build(df, backend):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        df, _ = so.presolve_dominated(df)
+        model = so.ShoppingModel(df, backend=backend)
+    return model, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", default="1,10", help="catalog scale factors, e.g. 1,10")
+    parser.add_argument("--solve", action="store_true", help="also solve the fixed profiles on both frames")
+    parser.add_argument("--backend", choices=so.ShoppingModel.BACKENDS, default="pulp")
+    parser.add_argument("--time-limit", type=int, default=30)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for scale in (int(s) for s in args.scales.split(",")):
+            path = CSV_PATH
+            if scale != 1:
+                path = os.path.join(workdir, f"catalog_x{scale}.csv")
+                write_scaled_csv(path, scale)
+            with contextlib.redirect_stdout(io.StringIO()):
+                skus, offers = so.canonicalize_products(so.preprocess_data(pd.read_csv(path)))
+            frames = {"full": (skus, offers), "compact": (so.compact_catalog(skus), so.compact_catalog(offers))}
+            print(f"\nx{scale}: {len(skus)} SKUs, {len(offers)} offers")
+            for label, (df, listing) in frames.items():
+                print(f"  {label:8s} skus {mb(so.catalog_memory(df))}  offers {mb(so.catalog_memory(listing))}  "
+                      f"columns {len(df.columns)}")
+            saved = 1 - so.catalog_memory(frames["compact"][0]) / so.catalog_memory(skus)
+            print(f"  compact SKU frame is {saved:.0%} smaller")
+
+            models = {}
+            for label, (df, _) in frames.items():
+                models[label], seconds = build(df, args.backend)
+                print(f"  {label:8s} presolve + model build {seconds:6.2f}s")
+            if not args.solve:
+                continue
+            for profile in PROFILES:
+                budget = profile[-1]
+                targets = profile_targets(profile)
+                costs = []
+                for model in models.values():
+                    model.set_targets(*targets, budget)
+                    status = model.solve(time_limit=args.time_limit, msg=False)
+                    costs.append(f"{model.extract(budget)['total_cost']:.2f}" if status == "Optimal" else "-")
+                print(f"  {profile} full={costs[0]} "
+                      f"compact={costs[1]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Peak memory and time of whole-file versus streamed catalog preprocessing.
+
+Writes a synthetic catalog (the bundled CSV repeated --scale times, see
+bench_common.write_scaled_csv) and preprocesses it in a fresh process each
+way, reporting the process memory high-water mark: pd.read_csv +
+preprocess_data on the whole file, then preprocess_csv in chunks of
+--chunk-size rows.
+
+Usage: python benchmarks/bench_ingest.py [--scale 100] [--chunk-size 100000]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+from bench_common import REPO_DIR, write_scaled_csv
+
+CHILD = """
+import contextlib, io, resource, sys, time
+import pandas as pd
+import shopping_optimizer_v2 as so
+path, mode, chunk_size = sys.argv[1], sys.argv[2], int(sys.argv[3])
+start = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    if mode == "whole":
+        df = so.preprocess_data(pd.read_csv(path))
+    else:
+        df, _, _ = so.preprocess_csv(path, chunk_size=chunk_size)
+print(len(df), time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=int, default=100)
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, f"catalog_x{args.scale}.csv")
+        write_scaled_csv(path, args.scale)
+        print(f"Catalog: {os.path.getsize(path) / 2**20:.0f} MB CSV (x{args.scale})")
+        for mode in ("whole", "streamed"):
+            out = subprocess.run([sys.executable, "-c", CHILD, path, mode, str(args.chunk_size)],
+                                 cwd=REPO_DIR, capture_output=True, text=True,
+                                 check=True).stdout.split()
+            products, seconds, peak_mb = int(out[0]), float(out[1]), float(out[2])
+            print(f"  {mode:8s} {products} products in {seconds:6.2f}s, peak RSS {peak_mb:7.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Before/after benchmark for building the shopping MIP on the full catalog.
+
+Usage: python benchmarks/bench_model_build.py [--repeat N]
+"""
+import argparse
+import contextlib
+import io
+import time
+
+import pandas as pd
+from pulp import LpProblem, LpVariable, lpSum, LpMinimize
+
+from bench_common import CSV_PATH
+import shopping_optimizer_v2 as so
+
+
+def legacy_build_model(df, tdee, protein_g, fat_g, carb_g, budget, days=30):
+    """The original per-row df.iloc model construction, kept for comparison."""
+    prob = LpProblem("ShoppingList", LpMinimize)
+    n = len(df)
+    items = [LpVariable(f"x_{i}", lowBound=0, upBound=5, cat='Integer') for i in range(n)]
+    y = [LpVariable(f"y_{i}", cat='Binary') for i in range(n)]
+    prob += lpSum([items[i] * df.iloc[i]["price"] for i in range(n)])
+    prob += lpSum([items[i] * df.iloc[i]["calories"] for i in range(n)]) >= tdee * days
+    prob += lpSum([items[i] * df.iloc[i]["protein"] for i in range(n)]) >= protein_g * days
+    prob += lpSum([items[i] * df.iloc[i]["fat"] for i in range(n)]) >= fat_g * days
+    prob += lpSum([items[i] * df.iloc[i]["carbs"] for i in range(n)]) >= carb_g * days
+    prob += lpSum([items[i] * df.iloc[i]["price"] for i in range(n)]) >= budget * 0.70
+    prob += lpSum([items[i] * df.iloc[i]["price"] for i in range(n)]) <= budget
+    for group in ['vegetables', 'fruits', 'dairy', 'legumes', 'meat_fish', 'grains']:
+        indices = [i for i in range(n) if df.iloc[i]['main_group'] == group]
+        if indices:
+            prob += lpSum([items[i] for i in indices]) >= 1
+    meat_indices = [i for i in range(n) if df.iloc[i]['main_group'] == 'meat_fish']
+    if meat_indices:
+        prob += lpSum([items[i] * df.iloc[i]["weight_g"] for i in meat_indices]) >= 7500
+    pasta_terms = ['makarna', 'pasta', 'spaghetti', 'penne', 'farfalle', 'rigatoni', 'şehriye', 'erişte']
+    pasta_indices = [i for i in range(n) if any(term in df.iloc[i]['name'].lower() for term in pasta_terms)]
+    if pasta_indices:
+        prob += lpSum([items[i] * df.iloc[i]["weight_g"] for i in pasta_indices]) <= 2500
+    bulgur_terms = ['bulgur', 'bulguru', 'bulgurlu']
+    bulgur_indices = [i for i in range(n) if any(term in df.iloc[i]['name'].lower() for term in bulgur_terms)]
+    if bulgur_indices:
+        prob += lpSum([items[i] * df.iloc[i]["weight_g"] for i in bulgur_indices]) <= 2500
+        prob += lpSum([y[i] for i in bulgur_indices]) <= 3
+    pirinc_terms = ['pirinç', 'pirinçli', 'rice']
+    pirinc_indices = [i for i in range(n) if any(term in df.iloc[i]['name'].lower() for term in pirinc_terms)]
+    if pirinc_indices:
+        prob += lpSum([items[i] * df.iloc[i]["weight_g"] for i in pirinc_indices]) <= 2500
+        prob += lpSum([y[i] for i in pirinc_indices]) <= 3
+    prob += lpSum([items[i] * df.iloc[i]["weight_g"] for i in range(n)]) <= 50000
+    prob += lpSum([items[i] for i in range(n)]) <= 200
+    for i in range(n):
+        prob += items[i] >= y[i]
+    prob += lpSum(y) >= 10
+    return prob, items, y
+
+
+def time_build(builder, df, repeat):
+    args = (df, 1850.0, 69.4, 51.4, 277.5, 3000.0, 30)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            prob, _, _ = builder(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings), prob
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = so.preprocess_data(pd.read_csv(CSV_PATH))
+    print(f"Catalog: {len(df)} products")
+
+    before, legacy_prob = time_build(legacy_build_model, df, 1)
+    after, prob = time_build(so.build_model, df, args.repeat)
+    assert len(prob.constraints) == len(legacy_prob.constraints)
+
+    print(f"before (per-row df.iloc): {before * 1000:8.0f} ms")
+    print(f"after  (bulk arrays):     {after * 1000:8.0f} ms")
+    print(f"speedup: {before / after:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Variables removed and solve-time gain from the dominance presolve.
+
+Builds and solves the bundled-catalog model with and without
+presolve_dominated() for a few fixed profiles and compares the results.
+
+Usage: python benchmarks/bench_presolve.py [--time-limit SECONDS]
+"""
+import argparse
+import contextlib
+import io
+import time
+
+from pulp import LpStatus, PULP_CBC_CMD, value
+
+from bench_common import PROFILES, load_skus, profile_targets
+import shopping_optimizer_v2 as so
+
+
+def solve(df, profile, time_limit):
+    budget = profile[-1]
+    tdee, protein_g, fat_g, carb_g = profile_targets(profile)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        prob, _, _ = so.build_model(df, tdee, protein_g, fat_g, carb_g, budget)
+    built = time.perf_counter()
+    prob.solve(PULP_CBC_CMD(msg=False, timeLimit=time_limit))
+    solved = time.perf_counter()
+    return {
+        "variables": len(prob.variables()),
+        "build": built - start,
+        "solve": solved - built,
+        "status": LpStatus[prob.status],
+        "cost": value(prob.objective),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--time-limit", type=int, default=30)
+    args = parser.parse_args()
+
+    df = load_skus()
+    start = time.perf_counter()
+    reduced, removed = so.presolve_dominated(df)
+    presolve_time = time.perf_counter() - start
+    print(f"Catalog: {len(df)} products, presolve removed {removed} "
+          f"({2 * removed} variables) in {presolve_time * 1000:.0f} ms")
+
+    for profile in PROFILES:
+        full = solve(df, profile, args.time_limit)
+        small = solve(reduced, profile, args.time_limit)
+        print(f"\n{profile}")
+        for label, run in (("full", full), ("presolved", small)):
+            cost = f"{run['cost']:.2f}" if run["cost"] is not None else "-"
+            print(f"  {label:9s} vars={run['variables']:6d} build={run['build']:6.2f}s "
+                  f"solve={run['solve']:6.2f}s status={run['status']} cost={cost}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Shortlist-and-expand solving against the full model.
+
+For the bundled catalog and synthetic copies scaled 10x, ... (see
+bench_common.write_scaled_csv) it solves a few fixed profiles once with every
+presolved product in the MIP and once with solve_shortlist on the catalog as
+loaded (optimize_shopping skips presolve in shortlist mode), reporting
+end-to-end wall time (the full model's includes its dominance presolve), the
+number of products in the final model and the basket cost of each.
+
+Usage: python benchmarks/bench_shortlist.py [--scales 1,10] [--k 40] [--backend pulp|highs]
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from bench_common import CSV_PATH, PROFILES, load_skus, profile_targets, write_scaled_csv
+import shopping_optimizer_v2 as so
+
+
+def load(scale, workdir):
+    path = CSV_PATH
+    if scale != 1:
+        path = os.path.join(workdir, f"catalog_x{scale}.csv")
+        write_scaled_csv(path, scale)
+    return load_skus(path, compact=True)
+
+
+def solve_full(df, targets, budget, backend, time_limit):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        df, _ = so.presolve_dominated(df)
+        model = so.ShoppingModel(df, backend=backend)
+    model.set_targets(*targets, budget)
+    status = model.solve(time_limit=time_limit, msg=False)
+    cost = model.extract(budget)["total_cost"] if status == "Optimal" else None
+    return {"seconds": time.perf_counter() - start, "products": len(df), "status": status, "cost": cost}
+
+
+def solve_shortlist(df, targets, budget, k, backend, time_limit):
+    start = time.perf_counter()
+    model, stats = so.solve_shortlist(df, *targets, budget, k=k, backend=backend, time_limit=time_limit)
+    status = model.solve_info["status"]
+    cost = model.extract(budget)["total_cost"] if status == "Optimal" else None
+    return {"seconds": time.perf_counter() - start, "products": stats["products"], "status": status,
+            "cost": cost, "rounds": f"{stats['lp_rounds']} LP/{stats['mip_rounds']} MIP"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", default="1,10", help="catalog scale factors, e.g. 1,10")
+    parser.add_argument("--k", type=int, default=40, help="initial shortlist size per group and class")
+    parser.add_argument("--backend", choices=so.ShoppingModel.BACKENDS, default="pulp")
+    parser.add_argument("--time-limit", type=int, default=30)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for scale in (int(s) for s in args.scales.split(",")):
+            df = load(scale, workdir)
+            print(f"\nx{scale}: {len(df)} products")
+            for profile in PROFILES:
+                budget = profile[-1]
+                targets = profile_targets(profile)
+                print(f"  {profile}")
+                for label, row in (("full", solve_full(df, targets, budget, args.backend, args.time_limit)),
+                                   ("shortlist", solve_shortlist(df, targets, budget, args.k, args.backend,
+                                                                 args.time_limit))):
+                    cost = f"{row['cost']:.2f}" if row["cost"] is not None else "-"
+                    print(f"    {label:9s} {row['seconds']:6.2f}s products={row['products']:6d} "
+                          f"status={row['status']} cost={cost} {row.get('rounds', '')}")
+
+
+if __name__ == "__main__":
+    main()
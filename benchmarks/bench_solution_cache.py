@@ -0,0 +1,76 @@
+"""Solution cache hit rates and latency on a stream of similar user profiles.
+
+Draws --users random profiles (fixed seed) from a narrow population: ages
+25-45, weights and heights around the reference user, the common activity
+levels and goals, and budgets of 3000 or 3500 TL. Each request goes through
+SolutionCache.optimize. It reports hit, warm-start and miss counts and mean
+latency per outcome. With --check, every cache hit is solved from scratch
+too and the cost difference is reported.
+
+Usage: python benchmarks/bench_solution_cache.py [--users 40] [--seed 0] [--check] [--backend pulp|highs]
+"""
+import argparse
+import contextlib
+import io
+import time
+
+import numpy as np
+
+from bench_common import load_skus
+import shopping_optimizer_v2 as so
+
+
+def population(users, seed):
+    rng = np.random.default_rng(seed)
+    for _ in range(users):
+        yield {
+            'age': int(rng.integers(25, 46)),
+            'gender': str(rng.choice(["male", "female"])),
+            'weight': float(rng.integers(60, 81)),
+            'height': float(rng.integers(165, 186)),
+            'activity': str(rng.choice(["sedentary", "lightly active"])),
+            'goal': str(rng.choice(["being healthy", "losing weight"])),
+            'budget': float(rng.choice([3000, 3500])),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--check", action="store_true", help="also solve every hit from scratch")
+    parser.add_argument("--backend", choices=so.ShoppingModel.BACKENDS, default="pulp")
+    args = parser.parse_args()
+
+    df = load_skus()
+    fingerprint = so.catalog_fingerprint(df)
+    cache = so.SolutionCache()
+    latencies = {'hit': [], 'warm': [], 'miss': [], 'none': []}
+    excess = []
+    for profile in population(args.users, args.seed):
+        tdee, protein_g, fat_g, carb_g = so.profile_targets(profile)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = cache.optimize(df, tdee, protein_g, fat_g, carb_g, profile['budget'],
+                                     fingerprint=fingerprint, backend=args.backend, msg=False)
+        latencies[results['cache'] if results else 'none'].append(time.perf_counter() - start)
+        if args.check and results and results['cache'] == 'hit':
+            with contextlib.redirect_stdout(io.StringIO()):
+                exact = so.optimize_shopping(df, tdee, protein_g, fat_g, carb_g, profile['budget'],
+                                             backend=args.backend, msg=False)
+            excess.append(results['total_cost'] / exact['total_cost'] - 1)
+
+    stats = cache.stats()
+    print(f"{stats['lookups']} requests: {stats['hits']} hits ({stats['hit_rate']:.0%}), "
+          f"{stats['warm_starts']} warm starts ({stats['warm_start_rate']:.0%}), {stats['misses']} misses, "
+          f"{stats['entries']} cached baskets")
+    for outcome, seconds in latencies.items():
+        if seconds:
+            print(f"  {outcome:5s} n={len(seconds):3d} mean={np.mean(seconds):7.3f}s max={np.max(seconds):7.3f}s")
+    if excess:
+        print(f"  hits cost {np.mean(excess):+.2%} on average (worst {np.max(excess):+.2%}) "
+              f"against solving them from scratch")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Per-stage timings of the whole pipeline, written as JSON for comparing commits.
+
+For the bundled catalog and synthetic copies scaled 10x, 100x, ... it times
+pd.read_csv, preprocess_data, canonicalize_products and presolve_dominated,
+then for a fixed set of profiles the model build, solve, result extraction
+and save_results_to_file.
+
+Synthetic catalogs repeat every CSV row with a numbered name suffix and
+prices jittered by up to +/-15% (fixed seed), so each copy is a distinct
+product. They are written to a temporary directory so read_csv is measured
+on a real file; 1000x is about 3.5 GB of CSV. Above --solve-max-scale only
+the load stages run.
+
+Usage: python benchmarks/bench_stages.py [--scales 1,10,100] [--output bench.json]
+                                          [--compare baseline.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+
+import pandas as pd
+
+from bench_common import CSV_PATH, PROFILES, REPO_DIR, profile_targets, write_scaled_csv
+import shopping_optimizer_v2 as so
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def bench_profile(df, profile, backend, time_limit, workdir):
+    budget = profile[-1]
+    tdee, protein_g, fat_g, carb_g = profile_targets(profile)
+    model, build = timed(so.ShoppingModel, df, backend=backend)
+    model.set_targets(tdee, protein_g, fat_g, carb_g, budget)
+    status, solve = timed(model.solve, time_limit=time_limit, msg=False)
+    row = {"profile": list(profile), "status": status, "build": build, "solve": solve}
+    if status == "Optimal":
+        results, row["extract"] = timed(model.extract, budget)
+        cwd = os.getcwd()
+        os.chdir(workdir)  # save_results_to_file writes to the working directory
+        try:
+            _, row["save_results_to_file"] = timed(so.save_results_to_file, results, budget, tdee,
+                                                   protein_g, fat_g, carb_g, 30)
+        finally:
+            os.chdir(cwd)
+        row["cost"] = float(results["total_cost"])
+    return row
+
+
+def bench_scale(scale, args, workdir):
+    path = CSV_PATH
+    if scale != 1:
+        path = os.path.join(workdir, f"catalog_x{scale}.csv")
+        write_scaled_csv(path, scale)
+    run = {"scale": scale, "stages": {}}
+    raw, run["stages"]["read_csv"] = timed(pd.read_csv, path)
+    run["rows"] = len(raw)
+    df, run["stages"]["preprocess"] = timed(so.preprocess_data, raw)
+    del raw
+    (df, _), run["stages"]["canonicalize"] = timed(so.canonicalize_products, df)
+    run["products"] = len(df)
+    if scale != 1:
+        os.remove(path)
+    if scale > args.solve_max_scale:
+        return run
+    (df, removed), run["stages"]["presolve"] = timed(so.presolve_dominated, df)
+    run["model_products"] = len(df)
+    run["profiles"] = [bench_profile(df, profile, args.backend, args.time_limit, workdir)
+                       for profile in PROFILES]
+    return run
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(report):
+    """{"x<scale> <stage>": seconds} over every timed stage of a report"""
+    flat = {}
+    for run in report["runs"]:
+        for stage, seconds in run["stages"].items():
+            flat[f"x{run['scale']} {stage}"] = seconds
+        for k, row in enumerate(run.get("profiles", [])):
+            for stage in ("build", "solve", "extract", "save_results_to_file"):
+                if stage in row:
+                    flat[f"x{run['scale']} profile{k} {stage}"] = row[stage]
+    return flat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", default="1,10,100", help="catalog scale factors, e.g. 1,10,100,1000")
+    parser.add_argument("--solve-max-scale", type=int, default=10,
+                        help="largest scale that also gets presolve/build/solve/extract/save")
+    parser.add_argument("--backend", choices=so.ShoppingModel.BACKENDS, default="pulp")
+    parser.add_argument("--time-limit", type=int, default=30)
+    parser.add_argument("--output", default="bench_stages.json")
+    parser.add_argument("--compare", metavar="JSON", help="earlier output to print speedups against")
+    args = parser.parse_args()
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "backend": args.backend,
+        "time_limit": args.time_limit,
+        "runs": [],
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for scale in (int(s) for s in args.scales.split(",")):
+            run = bench_scale(scale, args, workdir)
+            report["runs"].append(run)
+            stages = " ".join(f"{stage}={seconds:.2f}s" for stage, seconds in run["stages"].items())
+            print(f"x{scale}: {run['rows']} rows, {run['products']} products  {stages}")
+            for row in run.get("profiles", []):
+                cost = f"{row['cost']:.2f}" if "cost" in row else "-"
+                print(f"  {tuple(row['profile'])} build={row['build']:.2f}s solve={row['solve']:.2f}s "
+                      f"extract={row.get('extract', 0):.3f}s save={row.get('save_results_to_file', 0):.3f}s "
+                      f"status={row['status']} cost={cost}")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = flatten(json.load(f))
+        print(f"\nAgainst {args.compare} (speedup = old / new):")
+        for key, seconds in flatten(report).items():
+            if key in baseline and seconds > 0:
+                print(f"  {key:40s} {baseline[key]:8.3f}s -> {seconds:8.3f}s  x{baseline[key] / seconds:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""CLI start-up latency and how much of the catalog load hides behind the questions.
+
+Runs shopping_optimizer_v2.py as a subprocess: the median wall time of
+--help, --targets with a valid --profile and --targets with an invalid one
+(none of which import pandas or PuLP or load the catalog), the time until the
+first question is shown, and, for a --fast solve whose answers are typed
+--think seconds after the first prompt, how long the run still waits for the
+catalog once the answers are in (the catalog_wait metrics span) against the
+load and canonicalize time itself. That solve rewrites shopping_output.txt.
+
+Usage: python benchmarks/bench_startup.py [--runs 7] [--think 1.0]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shopping_optimizer_v2.py")
+
+PROFILE = {"age": 30, "gender": "male", "weight": 75, "height": 180, "activity": "sedentary",
+           "goal": "being healthy", "budget": 3000}
+ANSWERS = "30\nmale\n75\n180\nsedentary\nbeing healthy\n3000\n"
+
+
+def wall_time(args, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, SCRIPT, *args], capture_output=True, cwd=os.path.dirname(SCRIPT))
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def interactive_run(think):
+    """(seconds to the first prompt, metrics record) for one --fast solve"""
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-u", SCRIPT, "--fast", "--quiet", "--metrics", "-"],
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                            cwd=os.path.dirname(SCRIPT), text=True)
+    seen = ""
+    while not seen.endswith("Age: "):
+        seen += proc.stdout.read(1)
+    first_prompt = time.perf_counter() - start
+    time.sleep(think)
+    output, _ = proc.communicate(ANSWERS)
+    metrics = json.loads(output.strip().splitlines()[-1])
+    return first_prompt, metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--think", type=float, default=1.0, help="seconds between the first prompt and the answers")
+    args = parser.parse_args()
+
+    bad = dict(PROFILE, age=300)
+    for label, argv in (("--help", ["--help"]),
+                        ("--targets", ["--profile", json.dumps(PROFILE), "--targets"]),
+                        ("--targets (invalid)", ["--profile", json.dumps(bad), "--targets"])):
+        print(f"{label:20s} {wall_time(argv, args.runs) * 1000:6.0f} ms")
+
+    first_prompt, metrics = interactive_run(args.think)
+    spans = metrics["spans"]
+    load = spans.get("load", 0) + spans.get("preprocess", 0) + spans.get("canonicalize", 0)
+    print(f"first question after {first_prompt * 1000:.0f} ms")
+    print(f"catalog load + canonicalize {load:.2f}s, still waited {spans['catalog_wait']:.2f}s "
+          f"after answers typed {args.think:.1f}s later")
+
+
+if __name__ == "__main__":
+    main()
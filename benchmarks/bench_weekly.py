@@ -0,0 +1,57 @@
+"""Weekly-basket plan against the single 30-day basket.
+
+For a few fixed profiles it solves the presolved bundled catalog once as one
+30-day basket and once as weekly baskets sharing the budget
+(optimize_weekly), reporting wall time, sub-MIPs solved (and how many were
+proven optimal) and the cost of each. The weekly plan applies the unit cap
+and variety limits per week, so its cost difference to the single basket
+compares two problems rather than measuring the decomposition.
+The weekly sub-MIPs run on --workers processes; on a machine with at least
+as many cores as distinct week lengths the plan's wall time is that of its
+slowest sub-MIP.
+
+Usage: python benchmarks/bench_weekly.py [--workers N] [--backend pulp|highs] [--time-limit SECONDS]
+"""
+import argparse
+import contextlib
+import io
+
+from bench_common import PROFILES, load_skus, profile_targets
+import shopping_optimizer_v2 as so
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=None, help="solver processes (default: CPU count)")
+    parser.add_argument("--backend", choices=so.ShoppingModel.BACKENDS, default="pulp")
+    parser.add_argument("--time-limit", type=int, default=30)
+    parser.add_argument("--days", type=int, default=30)
+    args = parser.parse_args()
+
+    df = load_skus(presolve=True)
+    print(f"Catalog: {len(df)} products after presolve, weeks {so.split_weeks(args.days)}")
+
+    for profile in PROFILES:
+        budget = profile[-1]
+        tdee, protein_g, fat_g, carb_g = profile_targets(profile)
+        with contextlib.redirect_stdout(io.StringIO()):
+            plan = so.optimize_weekly(df, tdee, protein_g, fat_g, carb_g, budget, args.days,
+                                      workers=args.workers, time_limit=args.time_limit, presolve=False,
+                                      backend=args.backend, compare=True)
+        summary, single = plan["summary"], plan["summary"]["single_basket"]
+        single_cost = f"{single['total_cost']:.2f}" if single["total_cost"] is not None else "-"
+        difference = f"{summary['cost_difference']:+.1%}" if "cost_difference" in summary else "-"
+        print(f"\n{profile}")
+        print(f"  single  {single['seconds']:6.2f}s status={single['status']} proven={single['proven']} "
+              f"cost={single_cost}")
+        print(f"  weekly  {summary['seconds']:6.2f}s solved={summary['solved']}/{summary['weeks']} "
+              f"proven={summary['proven']} sub-MIPs={summary['sub_solves']} workers={summary['workers']} "
+              f"cost={summary['total_cost']:.2f} ({difference} under per-week limits)")
+        for week in plan["weeks"]:
+            cost = f"{week['results']['total_cost']:.2f}" if week["results"] else "-"
+            print(f"    week {week['week']}: {week['days']} days, budget {week['budget']:.2f}, "
+                  f"{week['seconds']:.2f}s, proven={week['proven']}, cost {cost}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""Long-running shopping optimizer service.
+
+Loads, preprocesses and canonicalizes the catalog once, then answers JSON
+profile requests over HTTP on a bounded pool of worker processes, each holding
+a prebuilt ShoppingModel.
+
+    python optimizer_service.py --port 8080 --workers 4
+
+Endpoints:
+    POST /optimize  profile JSON (age, gender, weight, height, activity, goal,
+                    budget, optional days and "fast": true) -> the results dict
+                    optimize_shopping returns, each item with its per-market offers
+    GET  /metrics   queue depth, in-flight, completed and solved counts, latency
+                    percentiles over every answered request and over solver runs,
+                    solution cache hit/warm-start/miss rates
+    GET  /health    liveness check
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+import shopping_optimizer_v2 as so
+
+
+class OptimizerService:
+    """Catalog, worker pool and request metrics shared by all HTTP handlers"""
+
+    def __init__(self, csv_path, workers=None, max_pending=64, time_limit=30, presolve=True,
+                 cache_size=256, cache_dir=None):
+        df, offers = so.canonicalize_products(so.load_catalog(csv_path))
+        df, self.offers = so.compact_catalog(df), so.compact_catalog(offers)
+        if presolve:
+            df, _ = so.presolve_dominated(df)
+        self.fingerprint = so.catalog_fingerprint(df)
+        self.cache = so.SolutionCache(maxsize=cache_size, path=cache_dir) if cache_size else None
+        self.workers = workers or os.cpu_count() or 1
+        self.time_limit = time_limit
+        self.max_pending = max_pending
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=so._init_batch_worker,
+                                        initargs=(df,))
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.solved = 0
+        self.rejected = 0
+        self.latencies = deque(maxlen=1000)
+        self.solve_latencies = deque(maxlen=1000)
+
+    def optimize(self, payload):
+        """Answer one profile request; returns (http_status, body).
+
+        Every answered request, cache hits and invalid profiles included,
+        counts as completed with its latency; requests turned away with 503
+        are counted as rejected instead.
+        """
+        start = time.perf_counter()
+        status = None  # stays None if the solve raises; the handler answers 500
+        try:
+            status, body = self._optimize(payload)
+            return status, body
+        finally:
+            if status != 503:
+                with self._lock:
+                    self.completed += 1
+                    self.latencies.append(time.perf_counter() - start)
+
+    def _optimize(self, payload):
+        try:
+            profile = so.validate_profile(payload)
+        except ValueError as e:
+            return 400, {'error': str(e)}
+        fast = bool(payload.get('fast'))
+        key = warm = None
+        if self.cache is not None:
+            tdee, protein_g, fat_g, carb_g = so.profile_targets(profile)
+            with self._lock:
+                key, results, warm = self.cache.lookup(self.fingerprint, tdee, protein_g, fat_g, carb_g,
+                                                        profile['budget'], profile.get('days', 30), fast)
+            if results is not None:
+                return 200, dict(results, cache='hit')
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            return 503, {'error': f"queue full ({self.max_pending} requests pending)"}
+
+        start = time.perf_counter()
+        with self._lock:
+            self.pending += 1
+        try:
+            outcome = self.pool.submit(so._solve_profile, profile, self.time_limit, fast, warm).result()
+        finally:
+            with self._lock:
+                self.pending -= 1
+                self.solved += 1
+                self.solve_latencies.append(time.perf_counter() - start)
+            self._slots.release()
+
+        if outcome['results'] is None:
+            return 422, {'error': f"no feasible basket (solver status: {outcome['status']})"}
+        so.attach_offers(outcome['results'], self.offers)
+        if key is None:
+            return 200, outcome['results']
+        with self._lock:
+            self.cache.store(key, outcome['results'], (tdee, protein_g, fat_g, carb_g, profile['budget']))
+        return 200, dict(outcome['results'], cache='warm' if warm is not None else 'miss')
+
+    def metrics(self):
+        with self._lock:
+            latencies = np.array(self.latencies)
+            solve_latencies = np.array(self.solve_latencies)
+            body = {
+                'workers': self.workers,
+                'queue_depth': max(self.pending - self.workers, 0),
+                'in_flight': self.pending,
+                'completed': self.completed,
+                'solved': self.solved,
+                'rejected': self.rejected,
+            }
+        if self.cache is not None:
+            with self._lock:
+                body['solution_cache'] = self.cache.stats()
+        for key, values in (('latency_seconds', latencies), ('solve_latency_seconds', solve_latencies)):
+            if len(values):
+                p50, p90, p99 = np.percentile(values, [50, 90, 99])
+                body[key] = {'p50': p50, 'p90': p90, 'p99': p99, 'max': values.max()}
+        return body
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+class OptimizerHandler(BaseHTTPRequestHandler):
+    service = None  # set by serve()
+
+    def _send(self, status, body):
+        data = json.dumps(body, default=so._json_default, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            self._send(200, self.service.metrics())
+        elif self.path == "/health":
+            self._send(200, {'status': 'ok'})
+        else:
+            self._send(404, {'error': f"unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/optimize":
+            self._send(404, {'error': f"unknown path {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(payload, dict):
+                raise ValueError("expected a JSON object")
+        except ValueError as e:
+            self._send(400, {'error': f"invalid JSON: {e}"})
+            return
+        try:
+            self._send(*self.service.optimize(payload))
+        except Exception as e:
+            self._send(500, {'error': f"internal error: {type(e).__name__}: {e}"})
+
+    def log_message(self, format, *args):
+        pass  # request lines would drown the solver output
+
+
+def serve(host="127.0.0.1", port=8080, csv_path="enriched_2025_05_21.csv", workers=None,
+          max_pending=64, time_limit=30, cache_size=256, cache_dir=None):
+    service = OptimizerService(csv_path, workers=workers, max_pending=max_pending, time_limit=time_limit,
+                               cache_size=cache_size, cache_dir=cache_dir)
+    OptimizerHandler.service = service
+    server = ThreadingHTTPServer((host, port), OptimizerHandler)
+    print(f"🚀 Shopping optimizer service on http://{host}:{port} ({service.workers} workers)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shopping optimizer HTTP service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--catalog", default="enriched_2025_05_21.csv")
+    parser.add_argument("--workers", type=int, default=None, help="solver processes (default: CPU count)")
+    parser.add_argument("--max-pending", type=int, default=64,
+                        help="requests queued or running before new ones get 503")
+    parser.add_argument("--time-limit", type=int, default=30, help="CBC time limit per solve (seconds)")
+    parser.add_argument("--cache-size", type=int, default=256,
+                        help="baskets kept in the in-memory solution cache (0 disables it)")
+    parser.add_argument("--cache-dir", default=None, help="also keep solved baskets as JSON files here")
+    args = parser.parse_args(argv)
+    serve(args.host, args.port, args.catalog, args.workers, args.max_pending, args.time_limit,
+          args.cache_size, args.cache_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,56 +1,238 @@
-import pandas as pd
-from pulp import LpProblem, LpVariable, lpSum, LpMinimize, LpStatus, value, PULP_CBC_CMD
 import re
 import os
+import io
+import sys
+import json
+import math
+import time
+import argparse
+import hashlib
+import tempfile
+import threading
+import contextlib
+import importlib.util
+from collections import OrderedDict
+
+def _lazy_import(name):
+    """Module that is only really imported on first attribute access.
+
+    pandas and NumPy take most of a second to import, which --help, --targets
+    and a bad --profile should not pay for. PuLP is imported inside the
+    ShoppingModel methods that use it, like scipy.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+pd = _lazy_import("pandas")
+np = _lazy_import("numpy")
 
 # --- Category Mapping using C column (item_category) ---
+# Ordered (group, item_category keywords, name keywords) rules: the first group
+# whose keywords appear in either column wins, everything else is 'other'.
+GROUP_RULES = [
+    ('exclude', ['granola'], ['granola']),
+    ('vegetables', ['sebze', 'domates', 'biber', 'salatalık', 'patates', 'soğan', 'havuç'],
+                   ['domates', 'biber', 'salatalık', 'patates', 'soğan', 'havuç', 'kabak']),
+    ('fruits', ['meyve', 'elma', 'muz', 'portakal', 'armut', 'çilek'],
+               ['elma', 'muz', 'portakal', 'armut', 'çilek', 'kayısı', 'şeftali']),
+    ('dairy', ['süt', 'kahvalt', 'peynir', 'yoğurt', 'süt ürünleri'],
+              ['peynir', 'yoğurt', 'süt', 'kaymak', 'krema']),
+    ('legumes', ['bakliyat', 'fasulye', 'mercimek', 'nohut', 'bezelye'],
+                ['fasulye', 'mercimek', 'nohut', 'bezelye', 'barbunya']),
+    ('meat_fish', ['et', 'balık', 'tavuk', 'kıyma', 'sucuk'],
+                  ['tavuk', 'balık', 'kıyma', 'sucuk', 'salam', 'pastırma']),
+    ('grains', ['temel gıda', 'ekmek', 'bulgur', 'pirinç', 'makarna', 'un'],
+               ['ekmek', 'bulgur', 'pirinç', 'makarna', 'un', 'börek']),
+]
+# Groups every basket must cover, and the groups a product class may name
+FOOD_GROUPS = ['vegetables', 'fruits', 'dairy', 'legumes', 'meat_fish', 'grains']
+
+# Exclusion keywords per column and the product classes with their own
+# weight/variety limits are declared in rules.json
+RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules.json")
+EXCLUDE_COLUMNS = ('category', 'item_category', 'name')
+CLASS_LIMITS = ('min_weight_g', 'max_weight_g', 'max_distinct')
+
+def load_rules(path=RULES_PATH):
+    """Read a rules file, raising ValueError for anything it cannot express.
+
+    Terms are lower-cased, as the catalog columns they are matched against are.
+    """
+    with open(path, encoding="utf-8") as f:
+        rules = json.load(f)
+    
+    def terms(where, values):
+        if not isinstance(values, list) or not all(isinstance(term, str) for term in values):
+            raise ValueError(f"{path}: {where} must be a list of strings")
+        return [term.lower() for term in values]
+    
+    for column, values in rules.get('exclude', {}).items():
+        if column not in EXCLUDE_COLUMNS:
+            raise ValueError(f"{path}: unknown exclude column {column!r} (expected one of {', '.join(EXCLUDE_COLUMNS)})")
+        rules['exclude'][column] = terms(f"exclude {column!r}", values)
+    for name, spec in rules.get('product_classes', {}).items():
+        if ('group' in spec) == ('name_terms' in spec):
+            raise ValueError(f"{path}: class {name!r} needs exactly one of 'group' or 'name_terms'")
+        if 'group' in spec and spec['group'] not in FOOD_GROUPS:
+            raise ValueError(f"{path}: class {name!r} has unknown group {spec['group']!r} "
+                             f"(expected one of {', '.join(FOOD_GROUPS)})")
+        if 'name_terms' in spec:
+            spec['name_terms'] = terms(f"class {name!r} 'name_terms'", spec['name_terms'])
+        unknown = set(spec) - {'group', 'name_terms', *CLASS_LIMITS}
+        if unknown:
+            raise ValueError(f"{path}: class {name!r} has unknown keys {', '.join(sorted(unknown))}")
+        if not any(limit in spec for limit in CLASS_LIMITS):
+            raise ValueError(f"{path}: class {name!r} sets none of {', '.join(CLASS_LIMITS)}")
+        for limit in CLASS_LIMITS:
+            if limit in spec and (not isinstance(spec[limit], (int, float)) or spec[limit] < 0):
+                raise ValueError(f"{path}: class {name!r} needs a non-negative number for {limit!r}")
+    return rules
+
+def use_rules(rules):
+    """Make a loaded rule set the active one for preprocessing and the model"""
+    global RULES, EXCLUDE_CATEGORY_TERMS, EXCLUDE_ITEM_CATEGORY_TERMS, EXCLUDE_NAME_TERMS
+    global PRODUCT_CLASSES, _rule_index
+    RULES = rules
+    exclude = rules.get('exclude', {})
+    EXCLUDE_CATEGORY_TERMS = exclude.get('category', [])
+    EXCLUDE_ITEM_CATEGORY_TERMS = exclude.get('item_category', [])
+    EXCLUDE_NAME_TERMS = exclude.get('name', [])
+    PRODUCT_CLASSES = rules.get('product_classes', {})
+    _rule_index = None  # compiled lazily against the catalog (see rule_index)
+
+def exclusion_digest():
+    """Short hash of the active exclusion rules, part of the catalog cache key"""
+    text = json.dumps(RULES.get('exclude', {}), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:8]
+
+use_rules(load_rules())
+
+def _terms_pattern(terms):
+    """Single regex alternation matching any of the given literal terms"""
+    if not terms:
+        return r"(?!)"  # matches nothing
+    return "|".join(re.escape(term) for term in terms)
+
 def map_main_group(row):
+    """Row-wise reference implementation of GROUP_RULES"""
     item_category = str(row['item_category']).lower()
     name = str(row['name']).lower()
-    
-    # Exclude granola items
-    if 'granola' in item_category or 'granola' in name:
-        return 'exclude'
-    
-    # Vegetables
-    if any(keyword in item_category for keyword in ['sebze', 'domates', 'biber', 'salatalık', 'patates', 'soğan', 'havuç']):
-        return 'vegetables'
-    if any(keyword in name for keyword in ['domates', 'biber', 'salatalık', 'patates', 'soğan', 'havuç', 'kabak']):
-        return 'vegetables'
-    
-    # Fruits
-    if any(keyword in item_category for keyword in ['meyve', 'elma', 'muz', 'portakal', 'armut', 'çilek']):
-        return 'fruits'
-    if any(keyword in name for keyword in ['elma', 'muz', 'portakal', 'armut', 'çilek', 'kayısı', 'şeftali']):
-        return 'fruits'
-    
-    # Dairy
-    if any(keyword in item_category for keyword in ['süt', 'kahvalt', 'peynir', 'yoğurt', 'süt ürünleri']):
-        return 'dairy'
-    if any(keyword in name for keyword in ['peynir', 'yoğurt', 'süt', 'kaymak', 'krema']):
-        return 'dairy'
-    
-    # Legumes
-    if any(keyword in item_category for keyword in ['bakliyat', 'fasulye', 'mercimek', 'nohut', 'bezelye']):
-        return 'legumes'
-    if any(keyword in name for keyword in ['fasulye', 'mercimek', 'nohut', 'bezelye', 'barbunya']):
-        return 'legumes'
-    
-    # Meat/Fish
-    if any(keyword in item_category for keyword in ['et', 'balık', 'tavuk', 'kıyma', 'sucuk']):
-        return 'meat_fish'
-    if any(keyword in name for keyword in ['tavuk', 'balık', 'kıyma', 'sucuk', 'salam', 'pastırma']):
-        return 'meat_fish'
-    
-    # Grains
-    if any(keyword in item_category for keyword in ['temel gıda', 'ekmek', 'bulgur', 'pirinç', 'makarna', 'un']):
-        return 'grains'
-    if any(keyword in name for keyword in ['ekmek', 'bulgur', 'pirinç', 'makarna', 'un', 'börek']):
-        return 'grains'
-    
+    for group, category_terms, name_terms in GROUP_RULES:
+        if any(keyword in item_category for keyword in category_terms):
+            return group
+        if any(keyword in name for keyword in name_terms):
+            return group
     return 'other'
 
-def get_user_input():
+def classify_products(df):
+    """Vectorized exclusion and food-group classification.
+
+    Each text column is lower-cased once and every rule set is matched with a
+    single regex alternation. Returns (exclude_mask, main_group) aligned with
+    df; granola products come back with main_group 'exclude'.
+    """
+    category = df["category"].fillna("nan").astype(str).str.lower()
+    item_category = df["item_category"].fillna("nan").astype(str).str.lower()
+    name = df["name"].fillna("nan").astype(str).str.lower()
+    
+    exclude = (category.str.contains(_terms_pattern(EXCLUDE_CATEGORY_TERMS)).to_numpy(dtype=bool)
+               | item_category.str.contains(_terms_pattern(EXCLUDE_ITEM_CATEGORY_TERMS)).to_numpy(dtype=bool)
+               | name.str.contains(_terms_pattern(EXCLUDE_NAME_TERMS)).to_numpy(dtype=bool))
+    
+    conditions = [
+        item_category.str.contains(_terms_pattern(category_terms)).to_numpy(dtype=bool)
+        | name.str.contains(_terms_pattern(name_terms)).to_numpy(dtype=bool)
+        for _, category_terms, name_terms in GROUP_RULES
+    ]
+    labels = [group for group, _, _ in GROUP_RULES]
+    main_group = pd.Series(np.select(conditions, labels, default='other'), index=df.index)
+    return pd.Series(exclude, index=df.index), main_group
+
+# --- User Profile ---
+# Accepted answers, shared by get_user_input and validate_profile
+GENDERS = ['male', 'female']
+ACTIVITY_LEVELS = ['sedentary', 'lightly active', 'moderately active', 'very active', 'extra active']
+GOALS = ['gaining weight', 'doing sports', 'losing weight', 'being healthy']
+
+def validate_profile(profile):
+    """Check a profile dict against the get_user_input rules.
+
+    Returns a normalized copy (numbers converted, choices lower-cased, days
+    defaulting to 30) or raises ValueError naming the first bad field.
+    """
+    def number(field, cast):
+        try:
+            raw = profile[field]
+        except KeyError:
+            raise ValueError(f"missing field '{field}'")
+        try:
+            if isinstance(raw, bool):
+                raise TypeError
+            result = cast(raw)
+            # NaN and inf pass float() and would slip through every range check
+            if not math.isfinite(float(raw)):
+                raise ValueError
+        except (TypeError, ValueError, OverflowError):
+            raise ValueError(f"'{field}' must be a number")
+        # int() would truncate 30.9 to 30 where the question rejects it
+        if cast is int and not float(raw).is_integer():
+            raise ValueError(f"'{field}' must be a whole number")
+        return result
+    
+    def choice(field, options):
+        answer = str(profile.get(field, "")).strip().lower()
+        if answer not in options:
+            raise ValueError(f"'{field}' must be one of: {', '.join(options)}")
+        return answer
+    
+    age = number('age', int)
+    if not 0 < age < 120:
+        raise ValueError("'age' must be between 1 and 120")
+    gender = choice('gender', GENDERS)
+    weight = number('weight', float)
+    if not 20 < weight < 300:
+        raise ValueError("'weight' must be between 20 and 300 kg")
+    height = number('height', float)
+    if not 100 < height < 250:
+        raise ValueError("'height' must be between 100 and 250 cm")
+    activity = choice('activity', ACTIVITY_LEVELS)
+    goal = choice('goal', GOALS)
+    budget = number('budget', float)
+    if not budget > 0:
+        raise ValueError("'budget' must be positive")
+    days = number('days', int) if 'days' in profile else 30
+    if not days > 0:
+        raise ValueError("'days' must be positive")
+    return {'age': age, 'gender': gender, 'weight': weight, 'height': height,
+            'activity': activity, 'goal': goal, 'budget': budget, 'days': days}
+
+def parse_profile(text):
+    """Validated profile from one JSON object; an 'id' field is passed through"""
+    try:
+        payload = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"not valid JSON ({e})") from None
+    if not isinstance(payload, dict):
+        raise ValueError("a profile must be a JSON object")
+    profile = validate_profile(payload)
+    if 'id' in payload:
+        profile['id'] = payload['id']
+    return profile
+
+def load_profile(source):
+    """Validated profile from inline JSON ('{"age": 30, ...}') or a JSON file path"""
+    if source.lstrip().startswith("{"):
+        return parse_profile(source)
+    with open(source, encoding="utf-8") as f:
+        return parse_profile(f.read())
+
+def get_user_input(ask_budget=True):
     print("\n=== SHOPPING OPTIMIZER v2.0 ===")
     print("Please enter your information:")
     
@@ -67,7 +249,7 @@ def get_user_input():
     # Gender validation
     while True:
         gender = input("Gender (male/female): ").strip().lower()
-        if gender in ['male', 'female']:
+        if gender in GENDERS:
             break
         print("Please enter either 'male' or 'female'.")
 
@@ -94,19 +276,20 @@ def get_user_input():
     # Activity level validation
     while True:
         activity = input("Activity level (sedentary/lightly active/moderately active/very active/extra active): ").strip().lower()
-        if activity in ['sedentary', 'lightly active', 'moderately active', 'very active', 'extra active']:
+        if activity in ACTIVITY_LEVELS:
             break
         print("Please enter one of the valid activity levels.")
 
     # Goal validation
     while True:
         goal = input("Goal (gaining weight/doing sports/losing weight/being healthy): ").strip().lower()
-        if goal in ['gaining weight', 'doing sports', 'losing weight', 'being healthy']:
+        if goal in GOALS:
             break
         print("Please enter one of the valid goals.")
 
-    # Budget validation
-    while True:
+    # Budget validation (skipped for sweeps, which take their own budgets)
+    budget = None
+    while ask_budget:
         try:
             budget = float(input("Monthly budget (TL): "))
             if budget > 0:
@@ -162,22 +345,111 @@ def get_macro_targets(tdee, goal):
     
     return tdee, protein_g, fat_g, carb_g
 
+# Optional multipack count ("3x75 gr"), amount with decimal point or comma,
+# then a unit ending at a word boundary (so "go" never reads as "g") or
+# glued to a trailing count ("800 grx2" reads like "800 gr x 2": 800 g),
+# then an optional trailing pack count ("75 gr x 6 adet", "30 gr x 36'lı")
+WEIGHT_PATTERN = (r"(?:(?P<count>\d+)\s*[x×]\s*)?"
+                  r"(?P<amount>\d+(?:[.,]\d+)?)\s*"
+                  r"(?P<unit>kg|gram|gr|g|ml|cc|lt|l)(?:\b|(?=[x×]\d))"
+                  r"(?:\s*[x×]\s*(?P<packs>\d+)\s*(?:adet|paket|['’]?l[ıiuü]\b))?")
+# "1.000 gr" is a thousand grams: a point before three digits is a Turkish
+# thousands separator for gram units
+THOUSANDS_PATTERN = r"^\d{1,3}\.\d{3}$"
+GRAM_UNITS = ('gram', 'gr', 'g')
+# Grams per unit; liquids are taken at roughly 1 g/ml
+WEIGHT_UNIT_GRAMS = {'kg': 1000, 'gram': 1, 'gr': 1, 'g': 1, 'ml': 1, 'cc': 1, 'lt': 1000, 'l': 1000}
+DEFAULT_WEIGHT_G = 1000
+
+def extract_weights(names):
+    """Extract package weights in grams from a Series of product names.
+
+    Multipacks count in full ("3x75 gr" and "75 gr x 3 adet" are 225 g)
+    and "1.000 gr" is 1000 g. Returns a DataFrame with weight_g and
+    weight_defaulted, the latter marking names where no weight was found
+    and DEFAULT_WEIGHT_G was used.
+    """
+    parts = names.fillna("").astype(str).str.lower().str.extract(WEIGHT_PATTERN)
+    thousands = parts["unit"].isin(GRAM_UNITS) & parts["amount"].str.match(THOUSANDS_PATTERN, na=False)
+    amount = parts["amount"].where(~thousands, parts["amount"].str.replace(".", "", regex=False))
+    amount = pd.to_numeric(amount.str.replace(",", ".", regex=False))
+    count = pd.to_numeric(parts["count"]).fillna(1) * pd.to_numeric(parts["packs"]).fillna(1)
+    grams = amount * count * parts["unit"].map(WEIGHT_UNIT_GRAMS)
+    defaulted = grams.isna()
+    return pd.DataFrame({
+        "weight_g": np.floor(grams.fillna(DEFAULT_WEIGHT_G).to_numpy(dtype=float)).astype(np.int64),
+        "weight_defaulted": defaulted.to_numpy(dtype=bool),
+    }, index=names.index)
+
 def extract_weight(name):
-    """Extract weight from product name"""
-    match = re.search(r"(\d+[.,]?\d*)\s*(kg|g|gr)", name.lower())
-    if match:
-        value = float(match.group(1).replace(",", "."))
-        unit = match.group(2)
-        if "kg" in unit:
-            return int(value * 1000)  # Convert kg to grams
-        else:
-            return int(value)  # Already in grams
-    return 1000  # Default weight in grams
+    """Extract weight in grams from a single product name"""
+    return int(extract_weights(pd.Series([name]))["weight_g"].iloc[0])
+
+# --- Run Metrics ---
+# Record of the run being measured (see start_metrics); None when off
+run_metrics = None
+
+def start_metrics(**fields):
+    """Begin a metrics record; spans and values are added as the run goes"""
+    global run_metrics
+    run_metrics = {'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"), **fields, 'spans': {}}
+    return run_metrics
+
+def record_metrics(**values):
+    if run_metrics is not None:
+        run_metrics.update(values)
+
+@contextlib.contextmanager
+def span(name):
+    """Add the wall time of the with-block to run_metrics['spans'][name]"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if run_metrics is not None:
+            spans = run_metrics['spans']
+            spans[name] = spans.get(name, 0.0) + time.perf_counter() - start
+
+def lap_timer(prefix):
+    """Function recording the time since its previous call as a span prefix.name"""
+    last = [time.perf_counter()]
+    def lap(name):
+        now = time.perf_counter()
+        if run_metrics is not None:
+            key = f"{prefix}.{name}"
+            run_metrics['spans'][key] = run_metrics['spans'].get(key, 0.0) + now - last[0]
+        last[0] = now
+    return lap
+
+def write_metrics(path, stdout=None):
+    """Append run_metrics as one JSON line to path ("-" for stdout, or the stdout stream given)"""
+    line = json.dumps(run_metrics, default=lambda obj: obj.item() if hasattr(obj, "item") else str(obj))
+    if path == "-":
+        (stdout or sys.__stdout__).write(line + "\n")
+    else:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+@contextlib.contextmanager
+def quiet_output(enabled=True):
+    """Send print() output to os.devnull while enabled"""
+    if not enabled:
+        yield
+        return
+    with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+        yield
 
 # --- Data Preprocessing ---
-def preprocess_data(df):
-    print("Preprocessing data...")
-    
+# Source columns the pipeline uses (image_url and anything else is never read)
+CATALOG_COLUMNS = ['category', 'subcategory', 'item_category', 'name', 'price', 'market',
+                   'calories', 'protein', 'carbs', 'fat']
+
+def apply_catalog_rules(df):
+    """Parse, validate, exclude, classify and weigh raw catalog rows.
+
+    Every rule looks at one row at a time, so the result for a file is the
+    concatenation of the results for its chunks.
+    """
     # Clean price column
     df["price"] = df["price"].astype(str).str.replace(" TL", "", regex=False)
     df["price"] = df["price"].str.replace(".", "", regex=False).str.replace(",", ".", regex=False)
@@ -187,61 +459,1362 @@ def preprocess_data(df):
     for col in ["calories", "protein", "carbs", "fat"]:
         df[col] = pd.to_numeric(df[col], errors="coerce")
     
-    # Remove rows with missing or invalid data
-    df = df.dropna(subset=["price", "calories", "protein", "carbs", "fat"])
-    df = df[(df["price"] > 0) & (df["calories"] >= 0) & (df["protein"] >= 0) & 
-            (df["carbs"] >= 0) & (df["fat"] >= 0)]
-    
-    # Exclude beverages
-    df = df[~df["category"].str.lower().str.contains("içecek")]
-    
-    # Exclude noodles
-    df = df[~df["name"].str.lower().str.contains("noodle")]
-    df = df[~df["item_category"].str.lower().str.contains("noodle")]
-    
-    # Exclude liver and heart products
-    df = df[~df["name"].str.lower().str.contains("ciğer")]
-    df = df[~df["name"].str.lower().str.contains("yürek")]
-    df = df[~df["name"].str.lower().str.contains("liver")]
-    df = df[~df["name"].str.lower().str.contains("heart")]
-    
-    # Exclude products containing 'çabuk' or 'bardak' (Turkish only)
-    df = df[~df["name"].str.lower().str.contains("çabuk")]
-    df = df[~df["name"].str.lower().str.contains("bardak")]
-    
-    # Exclude Berliner and Kruvasan products
-    df = df[~df["name"].str.lower().str.contains("berliner")]
-    df = df[~df["name"].str.lower().str.contains("kruvasan")]
-    df = df[~df["name"].str.lower().str.contains("croissant")]
+    # Remove rows with missing or invalid data (NaN fails every comparison,
+    # so one mask and one copy cover both)
+    valid = ((df["price"] > 0) & (df["calories"] >= 0) & (df["protein"] >= 0) &
+             (df["carbs"] >= 0) & (df["fat"] >= 0))
+    df = df[valid].copy()
     
-    # Exclude products containing 'pilavı' and 'çikolata'
-    df = df[~df["name"].str.lower().str.contains("pilavı")]
-    df = df[~df["name"].str.lower().str.contains("çikolata")]
+    # Exclusions (beverages, noodles, liver/heart, çabuk/bardak, pastries,
+    # pilavı, çikolata) and food groups in one pass over the text columns
+    exclude, main_group = classify_products(df)
     
     # Extract weight from product names
-    df["weight_g"] = df["name"].apply(extract_weight)
-    
-    # Apply filters
-    df = df[df["weight_g"] <= 5000]  # Max 5kg per item
-    df = df[df["price"] <= 1000]     # Max 1000 TL per item
-    df = df[df["calories"] > 0]      # Must have calories
-    
-    # Map categories using C column (item_category)
-    df['main_group'] = df.apply(map_main_group, axis=1)
-    
-    # Exclude granola items
-    df = df[df['main_group'] != 'exclude']
-    
+    weights = extract_weights(df["name"])
+    df["weight_g"] = weights["weight_g"]
+    df["weight_defaulted"] = weights["weight_defaulted"]
+    df["main_group"] = main_group
+    
+    # Apply filters in one step: max 5kg and 1000 TL per item, must have
+    # calories, and drop excluded (including granola) products
+    keep = (~exclude & (df["weight_g"] <= 5000) & (df["price"] <= 1000) &
+            (df["calories"] > 0) & (df["main_group"] != 'exclude'))
+    return df[keep]
+
+def _print_catalog_summary(df):
     print(f"Data preprocessing complete: {len(df)} products available")
     print(f"Price range: {df['price'].min():.2f} - {df['price'].max():.2f} TL")
     print(f"Calories range: {df['calories'].min():.0f} - {df['calories'].max():.0f} kcal")
     print(f"Average price: {df['price'].mean():.2f} TL")
     print(f"Average calories: {df['calories'].mean():.0f} kcal")
-    
+    print(f"Weight not found in name (defaulted to {DEFAULT_WEIGHT_G} g): {df['weight_defaulted'].sum()} products")
+
+def preprocess_data(df):
+    print("Preprocessing data...")
+    df = apply_catalog_rules(df)
+    _print_catalog_summary(df)
+    return df
+
+def _peak_rss_mb():
+    """Process memory high-water mark in MB, or None where unavailable"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+def preprocess_csv(csv_path, chunk_size=100_000):
+    """Stream a catalog CSV through the preprocessing rules chunk by chunk.
+
+    Only CATALOG_COLUMNS are read and only surviving rows are kept, so peak
+    memory is one raw chunk plus the cleaned catalog, however large the file.
+    The snapshot manifest, the (keys, contents) fingerprints of every raw
+    row (see _fingerprint_chunks), is computed in the same pass. Returns (df, memory, manifest) where memory holds the chunk and row
+    counts and the process memory high-water mark in MB.
+    """
+    print("Preprocessing data (streaming)...")
+    kept, keys, contents = [], [], []
+    memory = {'chunks': 0, 'rows': 0}
+    chunks = pd.read_csv(csv_path, usecols=CATALOG_COLUMNS, chunksize=chunk_size)
+    for chunk, chunk_keys, chunk_contents in _fingerprint_chunks(chunks):
+        memory['chunks'] += 1
+        memory['rows'] += len(chunk)
+        keys.append(chunk_keys)
+        contents.append(chunk_contents)
+        kept.append(apply_catalog_rules(chunk))
+        del chunk
+    df = pd.concat(kept) if len(kept) > 1 else kept[0]
+    del kept
+    memory['peak_rss_mb'] = _peak_rss_mb()
+    
+    peak = f", peak RSS {memory['peak_rss_mb']:.0f} MB" if memory['peak_rss_mb'] is not None else ""
+    print(f"Read {memory['rows']} rows in {memory['chunks']} chunks of up to {chunk_size}{peak}")
+    _print_catalog_summary(df)
+    return df, memory, (np.concatenate(keys), np.concatenate(contents))
+
+# --- Compiled Catalog Cache ---
+# Bump whenever preprocess_data (or anything it calls) changes its output, so
+# cached catalogs built under the old rules are rebuilt automatically.
+PREPROCESS_VERSION = 5
+CATALOG_CACHE_DIR = ".catalog_cache"
+
+def file_digest(path):
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _catalog_cache_path(csv_path, cache_dir):
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    key = f"{file_digest(csv_path)[:16]}-v{PREPROCESS_VERSION}-r{exclusion_digest()}"
+    return os.path.join(cache_dir, f"{stem}-{key}.npz"), stem
+
+def save_catalog(df, path, manifest=None):
+    """Write a preprocessed catalog to a columnar .npz file.
+
+    manifest is the source snapshot's (keys, contents) fingerprints (see
+    _fingerprint_chunks), stored so a later snapshot can be applied as a diff.
+    """
+    arrays = {"__index__": df.index.to_numpy(), "__columns__": np.array(df.columns, dtype=str)}
+    if manifest is not None:
+        arrays["__manifest_keys__"], arrays["__manifest_contents__"] = manifest
+    for col in df.columns:
+        column = df[col]
+        if column.dtype.kind in "biuf":
+            arrays[col] = column.to_numpy()
+        else:
+            missing = column.isna().to_numpy()
+            if missing.any():
+                arrays[f"{col}__isna"] = missing
+            arrays[col] = column.fillna("").to_numpy(dtype=str)
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+
+def read_catalog(path):
+    """Read a catalog written by save_catalog"""
+    with np.load(path, allow_pickle=False) as data:
+        columns = list(data["__columns__"])
+        df = pd.DataFrame({col: data[col] for col in columns}, index=data["__index__"])
+        for col in columns:
+            if f"{col}__isna" in data.files:
+                df[col] = df[col].mask(data[f"{col}__isna"])
+    return df
+
+def read_manifest(path):
+    """(keys, contents) stored by save_catalog, or None for older cache files"""
+    with np.load(path, allow_pickle=False) as data:
+        if "__manifest_keys__" not in data.files:
+            return None
+        return data["__manifest_keys__"], data["__manifest_contents__"]
+
+def _store_catalog(df, cache_path, stem, cache_dir, manifest):
+    os.makedirs(cache_dir, exist_ok=True)
+    # Drop stale builds of the same source before writing the new one
+    for entry in os.listdir(cache_dir):
+        if entry.startswith(f"{stem}-") and entry.endswith(".npz"):
+            os.remove(os.path.join(cache_dir, entry))
+    save_catalog(df, cache_path, manifest)
+    print(f"💾 Compiled catalog cached to {cache_path}")
+
+def load_catalog(csv_path="enriched_2025_05_21.csv", cache_dir=CATALOG_CACHE_DIR):
+    """Load the cleaned, grouped catalog, reusing the compiled cache when valid.
+
+    The cache is keyed by the CSV's content hash, PREPROCESS_VERSION and the
+    exclusion rules, so editing the source file, the preprocessing code or
+    rules.json's exclusions forces a rebuild.
+    """
+    cache_path, stem = _catalog_cache_path(csv_path, cache_dir)
+    if os.path.exists(cache_path):
+        with span('load'):
+            df = read_catalog(cache_path)
+        record_metrics(catalog_cache='hit')
+        print(f"Loaded compiled catalog from cache: {len(df)} products available")
+        return df
+    
+    with span('preprocess'):
+        df, memory, manifest = preprocess_csv(csv_path)
+    record_metrics(catalog_cache='miss', ingest=memory)
+    _store_catalog(df, cache_path, stem, cache_dir, manifest)
     return df
 
+# --- Incremental Snapshot Updates ---
+def _fingerprint_chunks(chunks):
+    """Yield (chunk, keys, contents) with uint64 fingerprints per raw row.
+
+    A row's key identifies the listing by name, market and how many earlier
+    rows share both (repeated listings stay distinct); its content hash
+    covers every CATALOG_COLUMNS value.
+    """
+    seen = pd.Series(dtype="int64")  # rows so far per (name, market) hash
+    for chunk in chunks:
+        base = pd.util.hash_pandas_object(chunk[['name', 'market']], index=False).to_numpy()
+        occurrence = (pd.Series(base).groupby(base).cumcount().to_numpy()
+                      + seen.reindex(base).fillna(0).to_numpy(dtype="int64"))
+        seen = seen.add(pd.Series(base).value_counts(), fill_value=0).astype("int64")
+        keys = pd.util.hash_pandas_object(pd.DataFrame({'base': base, 'occurrence': occurrence}),
+                                          index=False).to_numpy()
+        contents = pd.util.hash_pandas_object(chunk[CATALOG_COLUMNS], index=False).to_numpy()
+        yield chunk, keys, contents
+
+def update_catalog(previous_csv, new_csv, cache_dir=CATALOG_CACHE_DIR, chunk_size=100_000):
+    """Build the compiled catalog for a new snapshot as a diff of the previous one.
+
+    Rows of new_csv are matched to previous_csv's by listing key; only added
+    or changed rows go through apply_catalog_rules, unchanged ones are carried
+    over from the previous compiled catalog, and removed ones are dropped.
+    The result equals a full rebuild of new_csv and is cached under it.
+    Falls back to load_catalog(new_csv) when the previous snapshot has no
+    compiled catalog with a manifest. Returns (df, stats).
+    """
+    previous_path, _ = _catalog_cache_path(previous_csv, cache_dir)
+    manifest = read_manifest(previous_path) if os.path.exists(previous_path) else None
+    if manifest is None:
+        print(f"⚠️  No compiled catalog with a manifest for {previous_csv} - full rebuild")
+        return load_catalog(new_csv, cache_dir), {'full_rebuild': True}
+    
+    previous = read_catalog(previous_path)
+    old_keys, old_contents = manifest
+    old_lookup = pd.Index(old_keys)
+    parts, new_keys, new_contents = [], [], []
+    stats = {'full_rebuild': False, 'rows': 0, 'added': 0, 'changed': 0}
+    chunks = pd.read_csv(new_csv, usecols=CATALOG_COLUMNS, chunksize=chunk_size)
+    for chunk, keys, contents in _fingerprint_chunks(chunks):
+        new_keys.append(keys)
+        new_contents.append(contents)
+        old_pos = old_lookup.get_indexer(keys)
+        added = old_pos < 0
+        changed = ~added & (old_contents[old_pos] != contents)
+        stats['rows'] += len(chunk)
+        stats['added'] += int(added.sum())
+        stats['changed'] += int(changed.sum())
+        
+        # Unchanged rows: carry the previous compiled row over, re-indexed
+        # to its position in the new snapshot
+        same = ~(added | changed)
+        new_index = pd.Series(chunk.index[same], index=old_pos[same])
+        carried = previous[previous.index.isin(new_index.index)]
+        carried.index = new_index.loc[carried.index].to_numpy()
+        parts.append(carried)
+        if (added | changed).any():
+            parts.append(apply_catalog_rules(chunk[added | changed].copy()))
+    
+    new_keys, new_contents = np.concatenate(new_keys), np.concatenate(new_contents)
+    stats['removed'] = int((~pd.Index(old_keys).isin(new_keys)).sum())
+    df = pd.concat(parts).sort_index()
+    print(f"✅ Snapshot diff: {stats['added']} added, {stats['changed']} changed, "
+          f"{stats['removed']} removed of {stats['rows']} rows")
+    _print_catalog_summary(df)
+    _store_catalog(df, *_catalog_cache_path(new_csv, cache_dir), cache_dir, (new_keys, new_contents))
+    return df, stats
+
+# --- Canonical SKUs ---
+def normalize_names(names):
+    """Lower-cased names with punctuation and repeated spaces collapsed"""
+    return names.astype(str).str.lower().str.replace(r'[^\w]+', ' ', regex=True).str.strip()
+
+def canonicalize_products(df):
+    """Group listings of the same product into canonical SKUs.
+
+    Listings with the same normalized name and weight_g are one SKU, across
+    markets and repeated listings alike. Returns (skus, offers): skus holds
+    one row per SKU, taken from its cheapest listing, plus 'sku' and 'offers'
+    (offer count) columns; offers has every distinct (sku, market, price,
+    name) listing once, cheapest first within each SKU.
+    """
+    keys = pd.DataFrame({'name': normalize_names(df['name']).to_numpy(),
+                         'weight_g': df['weight_g'].to_numpy()})
+    sku = keys.groupby(['name', 'weight_g'], sort=False).ngroup().to_numpy()
+    # Listings ordered by SKU, then price, then catalog position
+    order = np.lexsort((np.arange(len(df)), df['price'].to_numpy(), sku))
+    sku_sorted = sku[order]
+    best = order[np.r_[True, sku_sorted[1:] != sku_sorted[:-1]]]
+    
+    offers = pd.DataFrame({
+        'sku': sku_sorted,
+        'market': df['market'].to_numpy()[order],
+        'price': df['price'].to_numpy()[order],
+        'name': df['name'].to_numpy()[order],
+    })
+    # The catalog repeats some listings verbatim; each is one offer
+    offers = offers.drop_duplicates(ignore_index=True)
+    skus = df.iloc[best].copy()
+    skus['sku'] = np.arange(len(best))
+    skus['offers'] = np.bincount(offers['sku'].to_numpy(), minlength=len(best))
+    print(f"✅ Canonicalized {len(df)} listings into {len(skus)} SKUs "
+          f"({int((skus['offers'] > 1).sum())} with more than one offer)")
+    return skus, offers
+
+def attach_offers(results, offers):
+    """Give each basket item its SKU's offer list ({market, price, name}, cheapest first)"""
+    skus = offers['sku'].to_numpy()
+    columns = offers['market'].tolist(), catalog_prices(offers).tolist(), offers['name'].tolist()
+    for item in results['items']:
+        if item.get('sku') is None:
+            continue  # a basket cached before items carried their SKU
+        lo, hi = np.searchsorted(skus, item['sku'], 'left'), np.searchsorted(skus, item['sku'], 'right')
+        item['offers'] = [{'market': market, 'price': price, 'name': name}
+                          for market, price, name in zip(*(column[lo:hi] for column in columns))]
+    return results
+
+# --- Compact Catalog ---
+# Columns the optimizer reads and the dtypes it keeps them in; any other
+# column (category, subcategory, item_category, weight_defaulted) is dropped
+COMPACT_DTYPES = {
+    'sku': 'int32',
+    'name': 'str',
+    'market': 'category',
+    'main_group': 'category',
+    'price': 'float32',
+    'calories': 'float32',
+    'protein': 'float32',
+    'carbs': 'float32',
+    'fat': 'float32',
+    'weight_g': 'int32',
+    'offers': 'int32',
+}
+
+def compact_catalog(df):
+    """Copy of a catalog (or offers) frame in the compact form the optimizer consumes.
+
+    Keeps only the COMPACT_DTYPES columns present: market and main_group
+    become categoricals (a code per row plus one copy of each label), prices
+    and nutrients float32, weights and counts int32. Every optimizer entry
+    point takes the result in place of the full frame; prices are read back
+    rounded to the cent (catalog_prices), so baskets and costs are unchanged.
+    """
+    return pd.DataFrame({name: df[name].astype(dtype) for name, dtype in COMPACT_DTYPES.items() if name in df},
+                        index=df.index)
+
+def catalog_prices(df):
+    """Prices as float64 rounded to the cent, undoing float32 storage"""
+    return np.round(df["price"].to_numpy(dtype=float), 2)
+
+def catalog_memory(df):
+    """Bytes held by a catalog frame, strings included"""
+    return int(df.memory_usage(deep=True).sum())
+
+# --- Product Classes ---
+NUTRIENTS = ('calories', 'protein', 'fat', 'carbs')
+# Basket limits shared by the MIP, the presolve and the fast heuristic
+# Amount limits (total weight and items, class weights) are for a basket
+# covering PLAN_DAYS; shorter baskets get them pro rata (see ShoppingModel)
+PLAN_DAYS = 30
+MAX_UNITS_PER_PRODUCT = 5
+MAX_TOTAL_ITEMS = 200
+MAX_TOTAL_WEIGHT_G = 50000
+MIN_DISTINCT_PRODUCTS = 10
+BUDGET_FLOOR = 0.70
+class RuleIndex:
+    """Inverted index from product-class terms to the product names containing them.
+
+    Each name is lower-cased and matched against the terms once, the first
+    time any catalog containing it is seen; class membership for a catalog or
+    any subset of it is then a set lookup per class rather than a keyword
+    scan per solve.
+    """
+    def __init__(self, classes):
+        self.classes = classes
+        self.postings = {term: set() for spec in classes.values() for term in spec.get('name_terms', [])}
+        self.members = {name: set() for name, spec in classes.items() if 'name_terms' in spec}
+        self.seen = set()
+    
+    def add(self, names):
+        """Index the names not seen before"""
+        new = pd.unique(names[~names.isin(self.seen)].to_numpy())
+        if not len(new):
+            return
+        lowered = pd.Series(new).astype(str).str.lower()
+        for term, posting in self.postings.items():
+            posting.update(new[lowered.str.contains(term, regex=False).to_numpy(dtype=bool)])
+        for name, members in self.members.items():
+            for term in self.classes[name]['name_terms']:
+                members.update(self.postings[term])
+        self.seen.update(new)
+    
+    def masks(self, df):
+        """{class: boolean membership array} aligned with df"""
+        self.add(df["name"])
+        masks = {}
+        for name, spec in self.classes.items():
+            if 'group' in spec:
+                masks[name] = df["main_group"].to_numpy() == spec['group']
+            else:
+                masks[name] = df["name"].isin(self.members[name]).to_numpy(dtype=bool)
+        return masks
+
+def rule_index():
+    """The RuleIndex of the active rules, built on first use"""
+    global _rule_index
+    if _rule_index is None:
+        _rule_index = RuleIndex(PRODUCT_CLASSES)
+    return _rule_index
+
+def product_class_masks(df):
+    """Membership masks for every product class in the active rules"""
+    return rule_index().masks(df)
+
+def describe_limits(spec):
+    parts = []
+    if 'min_weight_g' in spec:
+        parts.append(f"at least {spec['min_weight_g'] / 1000:g} kg")
+    if 'max_weight_g' in spec:
+        parts.append(f"maximum {spec['max_weight_g'] / 1000:g} kg")
+    if 'max_distinct' in spec:
+        parts.append(f"maximum {spec['max_distinct']} different items")
+    return " and ".join(parts)
+
+# --- Presolve ---
+def presolve_dominated(df, min_dominators=MAX_TOTAL_ITEMS // MAX_UNITS_PER_PRODUCT, chunk_size=512):
+    """Drop products that are dominated inside their constraint class.
+
+    Product j dominates i when both sit in the same main_group and the same
+    product classes, j costs no more, gives at least as much of every
+    nutrient and weighs no more (exactly as much in a class with a weight
+    floor, such as meat/fish). Exact duplicates dominate each other and the
+    first listed copy is kept.
+    
+    A product is only removed when it has at least min_dominators dominators.
+    With the default (200 items / 5 per product = 40) any basket using it can
+    move those units onto dominators without breaking the per-product, total
+    item, variety or class limits, at no extra cost. The one constraint this
+    does not cover is the 70% budget floor, which a cheaper swap could
+    undershoot. Returns (reduced_df, removed_count).
+    """
+    n = len(df)
+    # Columns where less is better, then columns where more is better
+    costs = df[["price", "weight_g"]].to_numpy(dtype=float)
+    gains = df[["calories", "protein", "fat", "carbs"]].to_numpy(dtype=float)
+    classes = product_class_masks(df)
+    signature = pd.DataFrame({'group': df["main_group"].to_numpy(), **classes})
+    class_ids = signature.groupby(list(signature.columns), sort=False).ngroup().to_numpy()
+    floored = np.zeros(n, dtype=bool)
+    for name, spec in PRODUCT_CLASSES.items():
+        if 'min_weight_g' in spec:
+            floored |= classes[name]
+    
+    dominated = np.zeros(n, dtype=bool)
+    for class_id in np.unique(class_ids):
+        members = np.flatnonzero(class_ids == class_id)
+        if len(members) <= min_dominators:
+            continue
+        c, g = costs[members], gains[members]
+        exact_weight = floored[members[0]]
+        order = np.arange(len(members))
+        for start in range(0, len(members), chunk_size):
+            rows = slice(start, start + chunk_size)
+            # no_worse[a, b]: member b is at least as good as member a everywhere
+            no_worse = order[None, :] != order[rows, None]
+            identical = no_worse.copy()
+            for k in range(c.shape[1]):
+                no_worse &= c[None, :, k] <= c[rows, None, k]
+                identical &= c[None, :, k] == c[rows, None, k]
+            for k in range(g.shape[1]):
+                no_worse &= g[None, :, k] >= g[rows, None, k]
+                identical &= g[None, :, k] == g[rows, None, k]
+            if exact_weight:
+                no_worse &= c[None, :, 1] == c[rows, None, 1]
+            # Identical rows only dominate the copies listed after them
+            dom = no_worse & (~identical | (order[None, :] < order[rows, None]))
+            dominated[members[rows]] = dom.sum(axis=1) >= min_dominators
+    
+    return df[~dominated], int(dominated.sum())
+
+# --- Model Construction ---
+
+# Running warm-start statistics across solves in this process
+warm_start_stats = {
+    'starts': 0, 'feasible_starts': 0,
+    'warm_solves': 0, 'warm_seconds': 0.0,
+    'cold_solves': 0, 'cold_seconds': 0.0,
+}
+
+def _record_solve_time(seconds, warm):
+    kind = 'warm' if warm else 'cold'
+    warm_start_stats[f'{kind}_solves'] += 1
+    warm_start_stats[f'{kind}_seconds'] += seconds
+
+def warm_start_report():
+    """Summary of warm_start_stats: feasible-start rate and mean time saved"""
+    stats = warm_start_stats
+    mean_warm = stats['warm_seconds'] / stats['warm_solves'] if stats['warm_solves'] else None
+    mean_cold = stats['cold_seconds'] / stats['cold_solves'] if stats['cold_solves'] else None
+    return {
+        'starts': stats['starts'],
+        'feasible_rate': stats['feasible_starts'] / stats['starts'] if stats['starts'] else None,
+        'mean_warm_seconds': mean_warm,
+        'mean_cold_seconds': mean_cold,
+        'mean_seconds_saved': mean_cold - mean_warm if mean_warm is not None and mean_cold is not None else None,
+    }
+
+CBC_LOG_FIELDS = {
+    'result': re.compile(r"^Result - (.+)$", re.M),
+    'objective': re.compile(r"^Objective value:\s+(\S+)", re.M),
+    'bound': re.compile(r"^Lower bound:\s+(\S+)", re.M),
+    'nodes': re.compile(r"^Enumerated nodes:\s+(\d+)", re.M),
+}
+
+def parse_cbc_log(path):
+    """Objective, bound, relative MIP gap and node count from a CBC log file"""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        text = f.read()
+    info = {}
+    for key, pattern in CBC_LOG_FIELDS.items():
+        match = pattern.search(text)
+        info[key] = match.group(1) if match else None
+    for key in ('objective', 'bound'):
+        info[key] = float(info[key]) if info[key] is not None else None
+    info['nodes'] = int(info['nodes']) if info['nodes'] is not None else None
+    if info['bound'] is None and info['result'] == "Optimal solution found":
+        info['bound'] = info['objective']
+    info['gap'] = None
+    if info['objective'] is not None and info['bound'] is not None:
+        info['gap'] = abs(info['objective'] - info['bound']) / max(abs(info['objective']), 1e-9)
+    return info
+
+class ShoppingModel:
+    """Reusable shopping MIP built once per catalog.
+
+    Only the right-hand sides depend on the user (nutrition targets, days and
+    budget), so the constraint matrix is assembled once in __init__ and
+    set_targets() updates the named target rows in place between solves.
+    Coefficient columns are pulled into NumPy arrays once and every affine
+    expression is assembled in a single bulk step instead of per-row df.iloc.
+    
+    backend='pulp' builds PuLP variables and solves with CBC through an LP
+    file; backend='highs' keeps the model as a sparse matrix over [x, y] and
+    hands it to HiGHS in-process via scipy.optimize.milp. Either way the
+    current solution is kept in self.quantities.
+    
+    period_days is how many days the basket covers. Weight and item-count
+    limits are scaled by period_days / PLAN_DAYS; the per-product unit cap,
+    the variety floor and the per-class distinct caps apply to every basket.
+    """
+    # Constraint names of the user-dependent rows
+    TARGET_ROWS = ('calories', 'protein', 'fat', 'carbs', 'budget_min', 'budget_max')
+    BACKENDS = ('pulp', 'highs')
+    
+    def __init__(self, df, backend='pulp', period_days=PLAN_DAYS):
+        if backend not in self.BACKENDS:
+            raise ValueError(f"backend must be one of {', '.join(self.BACKENDS)}, got {backend!r}")
+        self.df = df
+        self.backend = backend
+        self.period_days = period_days
+        print(f"Creating {len(df)} decision variables...")
+        
+        # Coefficient columns as arrays (one pass over the catalog each)
+        self.price = catalog_prices(df)
+        self.nutrients = df[list(NUTRIENTS)].to_numpy(dtype=float)
+        self.weight = df["weight_g"].to_numpy(dtype=float)
+        self.groups = df["main_group"].to_numpy()
+        share = period_days / PLAN_DAYS
+        self.class_rules = {name: {key: value * share if key.endswith('_weight_g') else value
+                                   for key, value in spec.items()}
+                            for name, spec in PRODUCT_CLASSES.items()}
+        self.max_weight = MAX_TOTAL_WEIGHT_G * share
+        self.max_items = MAX_TOTAL_ITEMS * share
+        self.classes = product_class_masks(df)
+        self.targets = None
+        self.quantities = None
+        self.solve_info = {}
+        
+        if backend == 'highs':
+            self._build_matrix()
+        else:
+            self._build_pulp()
+    
+    def _build_pulp(self):
+        from pulp import LpProblem, LpVariable, LpAffineExpression, lpSum, LpMinimize
+        lap = lap_timer('build')
+        self.prob = prob = LpProblem("ShoppingList", LpMinimize)
+        n = len(self.df)
+        groups, classes = self.groups, self.classes
+        price = self.price.tolist()
+        calories, protein, fat, carbs = self.nutrients.T.tolist()
+        weight = self.weight.tolist()
+        
+        # Decision variables: number of each item to buy (0-5)
+        self.items = items = [LpVariable(f"x_{i}", lowBound=0, upBound=MAX_UNITS_PER_PRODUCT, cat='Integer') for i in range(n)]
+        print(f"✅ Created {len(items)} item variables")
+        
+        # Binary variables for counting different items
+        self.y = y = [LpVariable(f"y_{i}", cat='Binary') for i in range(n)]
+        print(f"✅ Created {len(y)} binary variables")
+        lap('variables')
+        
+        def dot(coeffs, indices=None):
+            # Zero coefficients are dropped, matching PuLP's own item * 0 handling
+            if indices is None:
+                return LpAffineExpression([(items[i], coeffs[i]) for i in range(n) if coeffs[i]])
+            return LpAffineExpression([(items[i], coeffs[i]) for i in indices if coeffs[i]])
+        
+        # Objective: minimize total cost
+        cost = dot(price)
+        prob += cost
+        print("✅ Objective function set")
+        lap('objective')
+        
+        # Nutrition constraints (targets scaled for days are set by set_targets)
+        prob += dot(calories) >= 0, 'calories'
+        prob += dot(protein) >= 0, 'protein'
+        prob += dot(fat) >= 0, 'fat'
+        prob += dot(carbs) >= 0, 'carbs'
+        print("✅ Nutrition constraints added")
+        lap('nutrition')
+        
+        # Budget constraints: use at least 70% of budget
+        prob += cost >= 0, 'budget_min'
+        prob += cost <= 0, 'budget_max'
+        print("✅ Budget constraints added")
+        lap('budget')
+        
+        # Category diversity: at least 1 from each main group
+        ones = [1] * n
+        for group in FOOD_GROUPS:
+            indices = np.flatnonzero(groups == group)
+            if len(indices):
+                prob += dot(ones, indices) >= 1, group
+                print(f"  ✅ Added constraint for {group} ({len(indices)} products)")
+            else:
+                print(f"  ⚠️  No products in {group} category - skipping constraint")
+        print("✅ Category diversity constraints added")
+        lap('groups')
+        
+        # Product-class limits from rules.json (meat/fish floor, pasta,
+        # bulgur and pirinç caps)
+        for name, spec in self.class_rules.items():
+            indices = np.flatnonzero(classes[name])
+            if not len(indices):
+                print(f"  ⚠️  No {name} products available")
+                continue
+            if 'min_weight_g' in spec:
+                prob += dot(weight, indices) >= spec['min_weight_g'], f'{name}_weight_min'
+            if 'max_weight_g' in spec:
+                prob += dot(weight, indices) <= spec['max_weight_g'], f'{name}_weight_max'
+            if 'max_distinct' in spec:
+                prob += lpSum([y[i] for i in indices]) <= spec['max_distinct'], f'{name}_distinct'
+            print(f"  ✅ Added {name} constraints ({describe_limits(spec)} from {len(indices)} products)")
+        lap('product_classes')
+        
+        # Weight constraint: maximum 50kg total
+        prob += dot(weight) <= self.max_weight, 'total_weight'
+        # Product count constraint: maximum 200 products total
+        prob += dot(ones) <= self.max_items, 'total_items'
+        print("✅ Weight and product count constraints added")
+        lap('limits')
+        
+        # Product variety constraint: at least 10 different items
+        for i in range(n):
+            prob += items[i] >= y[i]
+        prob += lpSum(y) >= MIN_DISTINCT_PRODUCTS, 'variety'
+        print("✅ Product variety constraints added")
+        lap('variety')
+    
+    def _build_matrix(self):
+        """Same constraints as _build_pulp as one sparse matrix over z = [x, y]"""
+        try:
+            from scipy import sparse
+        except ImportError:
+            raise ImportError("backend='highs' needs scipy >= 1.9 (pip install scipy)") from None
+        n = len(self.df)
+        ones, zeros = np.ones(n), np.zeros(n)
+        # Rows on few variables: (name, x coefficients, y coefficients, lower, upper)
+        rows = [(name, self.nutrients[:, k], zeros, 0, np.inf) for k, name in enumerate(NUTRIENTS)]
+        rows.append(('budget', self.price, zeros, 0, 0))
+        for group in FOOD_GROUPS:
+            mask = self.groups == group
+            if mask.any():
+                rows.append((group, mask * 1.0, zeros, 1, np.inf))
+        for name, spec in self.class_rules.items():
+            mask = self.classes[name]
+            if not mask.any():
+                continue
+            if 'min_weight_g' in spec or 'max_weight_g' in spec:
+                rows.append((f'{name}_weight', self.weight * mask, zeros,
+                             spec.get('min_weight_g', -np.inf), spec.get('max_weight_g', np.inf)))
+            if 'max_distinct' in spec:
+                rows.append((f'{name}_distinct', zeros, mask * 1.0, -np.inf, spec['max_distinct']))
+        rows.append(('total_weight', self.weight, zeros, -np.inf, self.max_weight))
+        rows.append(('total_items', ones, zeros, -np.inf, self.max_items))
+        rows.append(('variety', zeros, ones, MIN_DISTINCT_PRODUCTS, np.inf))
+        
+        self.row_index = {row[0]: k for k, row in enumerate(rows)}
+        dense = sparse.csr_matrix(np.array([np.concatenate([x, y]) for _, x, y, _, _ in rows]))
+        # Linking rows x_i - y_i >= 0
+        identity = sparse.identity(n, format='csr')
+        self.A = sparse.vstack([dense, sparse.hstack([identity, -identity])], format='csr')
+        self.lb = np.concatenate([[row[3] for row in rows], zeros])
+        self.ub = np.concatenate([[row[4] for row in rows], np.full(n, np.inf)])
+        self.c = np.concatenate([self.price, zeros])
+        self.upper = np.concatenate([np.full(n, MAX_UNITS_PER_PRODUCT), ones])
+        print(f"✅ Built {self.A.shape[0]} x {self.A.shape[1]} constraint matrix ({self.A.nnz} non-zeros)")
+    
+    def set_targets(self, tdee, protein_g, fat_g, carb_g, budget, days=30):
+        """Point the model at one user's nutrition targets and budget"""
+        self.targets = {'nutrients': np.array([tdee, protein_g, fat_g, carb_g]) * days,
+                        'budget': budget}
+        if self.backend == 'highs':
+            for name, target in zip(NUTRIENTS, self.targets['nutrients']):
+                self.lb[self.row_index[name]] = target
+            self.lb[self.row_index['budget']] = budget * BUDGET_FLOOR
+            self.ub[self.row_index['budget']] = budget
+            return
+        rows = self.prob.constraints
+        rows['calories'].changeRHS(tdee * days)
+        rows['protein'].changeRHS(protein_g * days)
+        rows['fat'].changeRHS(fat_g * days)
+        rows['carbs'].changeRHS(carb_g * days)
+        rows['budget_min'].changeRHS(budget * BUDGET_FLOOR)
+        rows['budget_max'].changeRHS(budget)
+    
+    def update_prices(self, catalog):
+        """Patch cost coefficients in place from a newer catalog.
+
+        Products are matched on normalized name and weight (the canonical SKU
+        key) at their cheapest listing. The objective, the budget rows and
+        self.df's price column take the new prices; products missing from
+        catalog are capped at 0 units, and products the model lacks are only
+        counted (they need a rebuild). Returns {'updated', 'delisted', 'new'}.
+        Exact for a model built without presolve: with it, a price rise can
+        make a product the presolve dropped worth buying again.
+        """
+        def sku_keys(df):
+            return (normalize_names(df['name']) + "\x1f" + df['weight_g'].astype(str)).to_numpy()
+        offers = pd.Series(catalog_prices(catalog), index=sku_keys(catalog))
+        best = offers.groupby(level=0).min()
+        own = sku_keys(self.df)
+        price = best.reindex(own).to_numpy()
+        listed = ~np.isnan(price)
+        changed = listed & (price != self.price)
+        self.price = np.where(listed, price, self.price)
+        upper = np.where(listed, MAX_UNITS_PER_PRODUCT, 0)
+        n = len(self.df)
+        
+        if self.backend == 'highs':
+            self.c[:n] = self.price
+            row = self.row_index['budget']
+            start, end = self.A.indptr[row], self.A.indptr[row + 1]
+            self.A.data[start:end] = self.price[self.A.indices[start:end]]
+            self.upper[:n] = upper
+        else:
+            # Older PuLP copies the cost expression into each budget row,
+            # newer PuLP shares one; patch every distinct expression once
+            rows = [self.prob.objective, self.prob.constraints['budget_min'], self.prob.constraints['budget_max']]
+            expressions = {id(expr): expr for expr in (getattr(row, 'expr', row) for row in rows)}
+            for i in np.flatnonzero(changed):
+                for expr in expressions.values():
+                    expr[self.items[i]] = self.price[i]
+            for var, cap in zip(self.items, upper.tolist()):
+                var.upBound = cap
+        self.df = self.df.assign(price=self.price)
+        return {'updated': int(changed.sum()), 'delisted': int((~listed).sum()),
+                'new': int((~best.index.isin(own)).sum())}
+    
+    def set_initial_solution(self, basket):
+        """Load a previous basket as the MIP start.
+
+        basket is a results dict or its 'items' list; products are matched to
+        this catalog by (name, market) and anything no longer listed is
+        dropped. Returns (mapped_count, feasible), where feasible says whether
+        the mapped start satisfies every constraint of the current model.
+        """
+        basket_items = basket['items'] if isinstance(basket, dict) else basket
+        # The catalog lists some products more than once, so each basket line
+        # takes the next unused row with the same name, market and price
+        # (falling back to name and market alone)
+        rows = {}
+        names, markets = self.df['name'].tolist(), self.df['market'].tolist()
+        prices = catalog_prices(self.df).tolist()
+        for i, (name, market, price) in enumerate(zip(names, markets, prices)):
+            rows.setdefault((name, market, price), []).append(i)
+            rows.setdefault((name, market), []).append(i)
+        
+        quantities = np.zeros(len(self.df))
+        mapped = 0
+        for item in basket_items:
+            exact = rows.get((item['name'], item['market'], round(item['price_per_unit'], 2)), [])
+            loose = rows.get((item['name'], item['market']), [])
+            free = [i for i in exact + loose if quantities[i] == 0]
+            if free:
+                quantities[free[0]] = min(item['quantity'], MAX_UNITS_PER_PRODUCT)
+                mapped += 1
+        
+        if self.backend == 'highs':
+            # scipy's milp takes no MIP start; the basket is only checked
+            z = np.concatenate([quantities, quantities >= 1])
+            activity = self.A @ z
+            return mapped, bool((activity >= self.lb - 1e-6).all() and (activity <= self.ub + 1e-6).all())
+        for var, qty in zip(self.items, quantities.tolist()):
+            var.setInitialValue(qty)
+        for var, qty in zip(self.y, quantities.tolist()):
+            var.setInitialValue(1 if qty >= 1 else 0)
+        return mapped, self.prob.valid(1e-6)
+    
+    def _milp(self, time_limit, msg, integral=True, gap=None):
+        """Run HiGHS on the matrix model; returns scipy's OptimizeResult"""
+        from scipy.optimize import Bounds, LinearConstraint, milp
+        options = {'time_limit': time_limit, 'disp': msg}
+        if gap is not None:
+            options['mip_rel_gap'] = gap
+        return milp(self.c, integrality=np.full(len(self.c), int(integral)),
+                    bounds=Bounds(0, self.upper), constraints=LinearConstraint(self.A, self.lb, self.ub),
+                    options=options)
+    
+    def size(self):
+        """Variables, constraints and non-zero coefficients of the model"""
+        if self.backend == 'highs':
+            return {'products': len(self.df), 'variables': self.A.shape[1],
+                    'constraints': self.A.shape[0], 'nonzeros': int(self.A.nnz)}
+        constraints = self.prob.constraints.values()
+        return {'products': len(self.df), 'variables': 2 * len(self.df),
+                'constraints': len(constraints), 'nonzeros': sum(len(c) for c in constraints)}
+    
+    def _highs_status(self, res):
+        # Mirror PuLP's CBC statuses: a time-limited run with an incumbent
+        # reports "Optimal" there too
+        if res.x is not None and res.status in (0, 1):
+            return "Optimal"
+        return {2: "Infeasible", 3: "Unbounded"}.get(res.status, "Not Solved")
+    
+    def solve(self, time_limit=30, msg=True, warm_start=False, gap=None):
+        """Solve with the model's backend and return the PuLP status string.
+
+        With warm_start the current variable values (see
+        set_initial_solution) are passed to CBC as a MIP start; the HiGHS
+        backend has no MIP-start input and ignores it. gap is the relative
+        MIP gap at which the solver may stop. A basket found before the time
+        limit ran out is reported as "Optimal" as well (PuLP's convention);
+        solve_info['proven'] tells whether optimality was proven.
+        """
+        start = time.perf_counter()
+        if self.backend == 'highs':
+            res = self._milp(time_limit, msg, gap=gap)
+            status = self._highs_status(res)
+            if res.x is not None:
+                self.quantities = np.round(res.x[:len(self.df)])
+            self.solve_info = {'objective': res.fun, 'bound': getattr(res, 'mip_dual_bound', None),
+                               'gap': getattr(res, 'mip_gap', None), 'nodes': getattr(res, 'mip_node_count', None),
+                               'proven': res.status == 0}
+        else:
+            from pulp import LpStatus, LpSolutionOptimal, PULP_CBC_CMD
+            # CBC only reports its bound and node count in the log, which
+            # goes to a file when it is not shown
+            log_path = None
+            if not msg:
+                fd, log_path = tempfile.mkstemp(suffix=".log", prefix="cbc-")
+                os.close(fd)
+            try:
+                self.prob.solve(PULP_CBC_CMD(msg=msg, timeLimit=time_limit, warmStart=warm_start,
+                                             logPath=log_path, gapRel=gap))
+                self.solve_info = parse_cbc_log(log_path) if log_path else {}
+                self.solve_info['proven'] = self.prob.sol_status == LpSolutionOptimal
+            finally:
+                if log_path:
+                    os.remove(log_path)
+            status = LpStatus[self.prob.status]
+            self.quantities = np.array([var.varValue or 0.0 for var in self.items])
+        seconds = time.perf_counter() - start
+        self.solve_info.update(status=status, seconds=seconds)
+        _record_solve_time(seconds, warm_start and self.backend == 'pulp')
+        return status
+    
+    def solve_relaxation(self, time_limit=30):
+        """Solve the LP relaxation; returns (status, lp_bound, x) with x the item values"""
+        if self.backend == 'highs':
+            res = self._milp(time_limit, False, integral=False)
+            if res.x is None:
+                return self._highs_status(res), None, np.zeros(len(self.df))
+            return self._highs_status(res), res.fun, res.x[:len(self.df)]
+        from pulp import LpStatus, LpContinuous, LpInteger, PULP_CBC_CMD, value
+        variables = self.prob.variables()
+        for var in variables:
+            var.cat = LpContinuous
+        try:
+            self.prob.solve(PULP_CBC_CMD(msg=False, timeLimit=time_limit))
+        finally:
+            for var in variables:
+                var.cat = LpInteger
+        x = np.array([var.varValue or 0.0 for var in self.items])
+        return LpStatus[self.prob.status], value(self.prob.objective), x
+    
+    def relaxation_duals(self, time_limit=30):
+        """Solve the LP relaxation and return (status, lp_bound, duals).
+
+        duals maps the row names of _build_matrix (nutrients, 'budget', food
+        groups, '<class>_weight', '<class>_distinct', 'total_weight',
+        'total_items', 'variety') to their shadow prices, signed so that a
+        product's reduced cost is its price minus the dual-weighted sum of
+        its row coefficients. The x >= y linking rows are left out.
+        """
+        if self.backend == 'highs':
+            from scipy.optimize import linprog
+            from scipy.sparse import vstack as sparse_vstack
+            upper, lower = np.isfinite(self.ub), np.isfinite(self.lb)
+            res = linprog(self.c, A_ub=sparse_vstack([self.A[upper], -self.A[lower]]),
+                          b_ub=np.concatenate([self.ub[upper], -self.lb[lower]]),
+                          bounds=np.column_stack([np.zeros(len(self.c)), self.upper]),
+                          method='highs', options={'time_limit': time_limit})
+            if res.status != 0:
+                return {2: "Infeasible", 3: "Unbounded"}.get(res.status, "Not Solved"), None, {}
+            # Rows with both bounds were split into two <= rows
+            pi = np.zeros(len(self.lb))
+            pi[upper] += res.ineqlin.marginals[:upper.sum()]
+            pi[lower] -= res.ineqlin.marginals[upper.sum():]
+            return "Optimal", res.fun, {name: float(pi[k]) for name, k in self.row_index.items()}
+        status, bound, _ = self.solve_relaxation(time_limit)
+        duals = {}
+        for name, row in self.prob.constraints.items():
+            if re.fullmatch(r"_C\d+", name):
+                continue  # unnamed x >= y linking rows
+            # budget_min/budget_max and <class>_weight_min/_max are one row
+            # each in the matrix form
+            key = name.rsplit('_', 1)[0] if name.endswith(('_min', '_max')) else name
+            duals[key] = duals.get(key, 0.0) + (row.pi or 0.0)
+        return status, bound, duals
+    
+    def iter_incumbents(self, time_budget=30, target_gap=None, first_slice=2):
+        """Anytime solve: yield every improving basket until the time budget is spent.
+
+        The solve_fast heuristic gives the first basket within about a
+        second. The exact solver then runs in slices of doubling length
+        (first_slice, twice that, ...) within the remaining wall-clock
+        budget, each warm-started from the best basket so far (CBC only)
+        and told to stop at target_gap. Each improvement is yielded as a
+        dict with 'results', 'cost', 'bound', 'gap', 'seconds' (since the
+        start) and 'source'. Iteration ends once the gap is proven to be at
+        most target_gap (or optimality, without one), when the budget runs
+        out, or when the caller stops iterating; self.quantities and
+        self.solve_info then describe the best basket.
+        """
+        start = time.perf_counter()
+        best, best_q, bound = None, None, None
+        status, proven, found = "Not Solved", False, 0
+        
+        def gap_of(cost):
+            return max(cost - bound, 0) / max(cost, 1e-9) if bound is not None else None
+        
+        def incumbent(source):
+            results = self.extract(self.targets['budget'])
+            return {'results': results, 'cost': results['total_cost'], 'bound': bound,
+                    'gap': gap_of(results['total_cost']), 'seconds': time.perf_counter() - start,
+                    'source': source}
+        
+        def reached_target():
+            gap = gap_of(best['cost']) if best is not None else None
+            return target_gap is not None and gap is not None and gap <= target_gap
+        
+        try:
+            heuristic = self.solve_fast(time_limit=time_budget)
+            if heuristic is not None:
+                bound = heuristic['fast']['lp_bound']
+                best, best_q, found = incumbent('heuristic'), self.quantities.copy(), found + 1
+                yield best
+            
+            slice_seconds = first_slice
+            while not (proven or reached_target()):
+                remaining = time_budget - (time.perf_counter() - start)
+                if remaining < 0.5:
+                    break
+                warm = best is not None and self.backend == 'pulp'
+                if warm:
+                    self.set_initial_solution(best['results'])
+                status = self.solve(time_limit=min(slice_seconds, remaining), msg=False, warm_start=warm,
+                                    gap=target_gap)
+                slice_seconds *= 2
+                if status in ("Infeasible", "Unbounded"):
+                    break
+                proven = self.solve_info['proven']
+                if self.solve_info.get('bound') is not None:
+                    bound = max(bound if bound is not None else -np.inf, self.solve_info['bound'])
+                if status == "Optimal" and (best is None or self.solve_info['objective'] < best['cost'] - 1e-6):
+                    best, best_q, found = incumbent(self.backend), self.quantities.copy(), found + 1
+                    yield best
+        finally:
+            if best is not None:
+                self.quantities = best_q
+                status = "Optimal" if proven or reached_target() else "Feasible"
+                self.solve_info = {'status': status, 'objective': best['cost'], 'bound': bound,
+                                   'gap': gap_of(best['cost'])}
+            else:
+                self.solve_info = {'status': status}
+            self.solve_info.update(proven=proven, incumbents=found, seconds=time.perf_counter() - start)
+    
+    def solve_anytime(self, time_budget=30, target_gap=None, callback=None):
+        """Run iter_incumbents and return the best incumbent, or None.
+
+        callback, if given, is called with every incumbent as it is found;
+        returning False from it stops the search there.
+        """
+        best = None
+        incumbents = self.iter_incumbents(time_budget, target_gap)
+        for best in incumbents:
+            if callback is not None and callback(best) is False:
+                incumbents.close()
+                break
+        return best
+    
+    def _basket_state(self, q):
+        """Aggregates of a basket q that the limits are written against"""
+        used = q > 0
+        return {
+            'cost': self.price @ q,
+            'nutrients': self.nutrients.T @ q,
+            'weight': self.weight @ q,
+            'items': q.sum(),
+            'distinct': used.sum(),
+            'group_units': {group: q[self.groups == group].sum() for group in FOOD_GROUPS
+                            if (self.groups == group).any()},
+            'class_weight': {name: self.weight[mask] @ q[mask] for name, mask in self.classes.items()},
+            'class_distinct': {name: used[mask].sum() for name, mask in self.classes.items()},
+        }
+    
+    def _lower_bounds_met(self, state):
+        budget = self.targets['budget']
+        return ((state['nutrients'] >= self.targets['nutrients'] - 1e-6).all()
+                and all(state['class_weight'][name] >= spec['min_weight_g'] or not self.classes[name].any()
+                        for name, spec in self.class_rules.items() if 'min_weight_g' in spec)
+                and all(units >= 1 for units in state['group_units'].values())
+                and state['distinct'] >= MIN_DISTINCT_PRODUCTS
+                and state['cost'] >= budget * BUDGET_FLOOR - 1e-6)
+    
+    def _addable(self, q, state):
+        """Mask of products that can take one more unit without breaking a cap"""
+        w = self.weight
+        ok = ((q < MAX_UNITS_PER_PRODUCT)
+              & (state['weight'] + w <= self.max_weight)
+              & (state['items'] + 1 <= self.max_items)
+              & (state['cost'] + self.price <= self.targets['budget'] + 1e-6))
+        for name, spec in self.class_rules.items():
+            mask = self.classes[name]
+            if 'max_weight_g' in spec:
+                ok &= ~mask | (state['class_weight'][name] + w <= spec['max_weight_g'])
+            if 'max_distinct' in spec:
+                ok &= ~mask | (q > 0) | (state['class_distinct'][name] < spec['max_distinct'])
+        return ok
+    
+    def _shortfall(self, nutrients, class_weight, group_units, distinct, cost):
+        """How far a basket (or, with array arguments, one candidate per row) is below its lower limits.
+
+        Each limit's shortfall is measured as a share of the limit, so 0
+        means every lower limit holds.
+        """
+        targets = self.targets['nutrients']
+        floor = self.targets['budget'] * BUDGET_FLOOR
+        total = (np.maximum(targets - nutrients, 0) / np.maximum(targets, 1e-9)).sum(axis=-1)
+        for name, spec in self.class_rules.items():
+            if 'min_weight_g' in spec and self.classes[name].any():
+                total = total + np.maximum(spec['min_weight_g'] - class_weight[name], 0) / spec['min_weight_g']
+        for units in group_units.values():
+            total = total + (units < 1)
+        total = total + np.maximum(MIN_DISTINCT_PRODUCTS - distinct, 0) / MIN_DISTINCT_PRODUCTS
+        return total + np.maximum(floor - cost, 0) / max(floor, 1e-9)
+    
+    def _best_swap(self, q, state):
+        """(out, in) trading one unit of out for one of in that most reduces the shortfall.
+
+        Used once the item or weight caps stop the lower limits being met
+        by adding units alone. Among equal shortfalls the cheaper basket
+        wins; None if no swap reduces the shortfall.
+        """
+        current = self._shortfall(state['nutrients'], state['class_weight'], state['group_units'],
+                                  state['distinct'], state['cost'])
+        best, best_key = None, None
+        for out in np.flatnonzero(q > 0):
+            trial = q.copy()
+            trial[out] -= 1
+            after = self._basket_state(trial)
+            # The shortfall with one unit of each candidate product added
+            shortfall = self._shortfall(
+                after['nutrients'] + self.nutrients,
+                {name: after['class_weight'][name] + self.weight * mask for name, mask in self.classes.items()},
+                {group: units + (self.groups == group) for group, units in after['group_units'].items()},
+                after['distinct'] + (trial == 0),
+                after['cost'] + self.price)
+            ok = self._addable(trial, after) & (shortfall < current)
+            ok[out] = False
+            if not ok.any():
+                continue
+            candidates = np.flatnonzero(ok)
+            into = int(candidates[np.lexsort((self.price[candidates], np.round(shortfall[candidates], 9)))[0]])
+            key = (round(float(shortfall[into]), 9), float(self.price[into] - self.price[out]))
+            if best_key is None or key < best_key:
+                best, best_key = (int(out), into), key
+        return best
+    
+    def _repair(self, q):
+        """Greedily add units until every lower limit holds; False if stuck.
+
+        Once the caps leave no useful unit to add, one unit is swapped for
+        another at a time (see _best_swap) instead.
+        """
+        targets = self.targets['nutrients']
+        floors = {name: spec['min_weight_g'] for name, spec in self.class_rules.items()
+                  if 'min_weight_g' in spec and self.classes[name].any()}
+        floor = self.targets['budget'] * BUDGET_FLOOR
+        while True:
+            state = self._basket_state(q)
+            if self._lower_bounds_met(state):
+                return True
+            addable = self._addable(q, state)
+            deficit = np.maximum(targets - state['nutrients'], 0)
+            weight_short = {name: minimum - state['class_weight'][name] for name, minimum in floors.items()
+                            if state['class_weight'][name] < minimum}
+            variety_short = state['distinct'] < MIN_DISTINCT_PRODUCTS
+            if deficit.any() or weight_short or variety_short or min(state['group_units'].values()) < 1:
+                # Coverage of what is still missing per TL spent
+                gain = (np.minimum(self.nutrients, deficit) / np.maximum(targets, 1e-9)).sum(axis=1)
+                for name, short in weight_short.items():
+                    gain += self.classes[name] * np.minimum(self.weight, short) / floors[name]
+                gain += np.isin(self.groups, [g for g, units in state['group_units'].items() if units < 1])
+                gain += variety_short * (q == 0)
+                score = np.where(addable & (gain > 0), gain / self.price, -np.inf)
+            else:
+                # Only the budget floor is short: close the gap with the
+                # cheapest single item that does, else the dearest item
+                gap = floor - state['cost']
+                closes = addable & (self.price >= gap)
+                score = np.where(closes, -self.price, -np.inf) if closes.any() else np.where(addable, self.price, -np.inf)
+            best = int(np.argmax(score))
+            if np.isfinite(score[best]):
+                q[best] += 1
+                continue
+            swap = self._best_swap(q, state)
+            if swap is None:
+                return False
+            q[swap[0]] -= 1
+            q[swap[1]] += 1
+    
+    def _trim(self, q):
+        """Drop units, dearest first, while every lower limit still holds"""
+        for i in np.argsort(-self.price):
+            while q[i] > 0:
+                q[i] -= 1
+                if not self._lower_bounds_met(self._basket_state(q)):
+                    q[i] += 1
+                    break
+    
+    def solve_fast(self, time_limit=30):
+        """Sub-second heuristic: LP relaxation, rounding, then repair.
+
+        The relaxation's fractional quantities are rounded down, the
+        fractional ones are then rounded up where every cap allows, missing
+        nutrients, class weight floors, groups, variety and budget floor are filled
+        greedily by coverage per TL (swapping units once the item or weight
+        caps bind), and surplus units are trimmed. Returns a
+        results dict whose 'fast' entry holds the LP bound and the proven
+        relative gap, or None if no feasible basket was reached.
+        """
+        start = time.perf_counter()
+        status, lp_bound, x = self.solve_relaxation(time_limit)
+        if status != "Optimal":
+            return None
+        
+        q = np.floor(x + 1e-6)
+        for i in np.argsort(-(x - q)):
+            if x[i] - q[i] <= 1e-6:
+                break
+            if self._addable(q, self._basket_state(q))[i]:
+                q[i] += 1
+        if not self._repair(q):
+            return None
+        self._trim(q)
+        
+        self.quantities = q
+        results = self.extract(self.targets['budget'])
+        results['fast'] = {
+            'lp_bound': lp_bound,
+            'gap': float((results['total_cost'] - lp_bound) / lp_bound) if lp_bound else 0.0,
+            'seconds': time.perf_counter() - start,
+        }
+        return results
+    
+    def extract(self, budget):
+        """Results dict for the current solution"""
+        return extract_results(self.df, self.quantities, budget)
+
+def build_model(df, tdee, protein_g, fat_g, carb_g, budget, days=30):
+    """Build the shopping MIP for one user, returning (prob, items, y)"""
+    model = ShoppingModel(df)
+    model.set_targets(tdee, protein_g, fat_g, carb_g, budget, days)
+    return model.prob, model.items, model.y
+
+# --- Shortlist and Expand ---
+# Relative gap to the LP bound below which a basket counts as optimal
+# (HiGHS' default mip_rel_gap)
+SHORTLIST_GAP = 1e-4
+
+def reduced_costs(df, duals):
+    """Reduced costs of every product of df against relaxation_duals' duals.
+
+    Returns (d, e): d is the reduced cost of one unit of a product and e the
+    credit the variety rows give its first unit. A left-out product can
+    lower the LP bound only if d - max(e, 0) < 0, and any basket that uses
+    it costs at least lp_bound + d - max(e, 0).
+    """
+    price = catalog_prices(df)
+    weight = df["weight_g"].to_numpy(dtype=float)
+    groups = df["main_group"].to_numpy()
+    d = price * (1 - duals.get('budget', 0.0)) - duals.get('total_weight', 0.0) * weight - duals.get('total_items', 0.0)
+    for name in NUTRIENTS:
+        d -= duals.get(name, 0.0) * df[name].to_numpy(dtype=float)
+    for group in FOOD_GROUPS:
+        d -= duals.get(group, 0.0) * (groups == group)
+    e = np.full(len(df), duals.get('variety', 0.0))
+    for name, mask in product_class_masks(df).items():
+        d -= duals.get(f'{name}_weight', 0.0) * weight * mask
+        e += duals.get(f'{name}_distinct', 0.0) * mask
+    return d, e
+
+def shortlist_mask(df, targets, k):
+    """Top-k products per main_group and per product class by cost efficiency.
+
+    Efficiency is the share of the nutrition targets one unit covers per
+    TL; classes with a weight floor also take their top-k by grams per TL.
+    """
+    price = catalog_prices(df)
+    coverage = (df[list(NUTRIENTS)].to_numpy(dtype=float) / targets).sum(axis=1) / price
+    grams = df["weight_g"].to_numpy(dtype=float) / price
+    chosen = np.zeros(len(df), dtype=bool)
+    
+    def top(mask, score):
+        indices = np.flatnonzero(mask)
+        chosen[indices[np.argsort(-score[indices], kind='stable')[:k]]] = True
+    
+    groups = df["main_group"].to_numpy()
+    for group in pd.unique(groups):
+        top(groups == group, coverage)
+    for name, mask in product_class_masks(df).items():
+        top(mask, coverage)
+        if 'min_weight_g' in PRODUCT_CLASSES[name]:
+            top(mask, grams)
+    return chosen
+
+def solve_shortlist(df, tdee, protein_g, fat_g, carb_g, budget, days=30, k=40, backend='pulp',
+                    time_limit=30, msg=False):
+    """Solve the MIP on a shortlist of products, growing it until no left-out product can help.
+
+    Phase 1 is column generation on the LP relaxation: products with a
+    negative reduced cost against the restricted LP's duals join the
+    shortlist until none remain, at which point the restricted LP bound is
+    the full catalog's. Phase 2 solves the MIP on the shortlist. A left-out
+    product can only be in a cheaper basket if the LP bound plus its reduced
+    cost is below the basket found, so those products are added and the MIP
+    solved again (warm-started) until there are none, or the basket is
+    within SHORTLIST_GAP of the LP bound. With proven-optimal solves the
+    result is the full model's optimum.
+    
+    Returns (model, stats); model is the final ShoppingModel over the
+    shortlist and holds the solution.
+    """
+    targets = np.array([tdee, protein_g, fat_g, carb_g]) * days
+    chosen = shortlist_mask(df, targets, k)
+    stats = {'catalog': len(df), 'initial': int(chosen.sum()), 'lp_rounds': 0, 'mip_rounds': 0}
+    
+    def build():
+        with contextlib.redirect_stdout(io.StringIO()):
+            model = ShoppingModel(df[chosen], backend=backend)
+        model.set_targets(tdee, protein_g, fat_g, carb_g, budget, days)
+        return model
+    
+    slack = None
+    while True:
+        model = build()
+        status, bound, duals = model.relaxation_duals(time_limit)
+        stats['lp_rounds'] += 1
+        if status != "Optimal":
+            if chosen.all():
+                break  # the full catalog cannot meet the targets either
+            # The shortlist alone cannot meet the targets: widen it
+            k *= 2
+            chosen |= shortlist_mask(df, targets, k)
+            continue
+        d, e = reduced_costs(df, duals)
+        slack = d - np.maximum(e, 0)
+        improving = ~chosen & (slack < -1e-6)
+        if not improving.any():
+            break
+        chosen |= improving
+    
+    basket = None
+    while True:
+        if basket is not None:
+            model.set_initial_solution(basket)
+        status = model.solve(time_limit=time_limit, msg=msg, warm_start=basket is not None)
+        stats['mip_rounds'] += 1
+        if status != "Optimal" or slack is None:
+            break
+        basket = model.extract(budget)
+        gap = basket['total_cost'] - bound
+        if gap <= SHORTLIST_GAP * bound:
+            break  # already within the solvers' optimality tolerance of the LP bound
+        candidates = ~chosen & (slack < gap - 1e-6)
+        if not candidates.any():
+            break
+        chosen |= candidates
+        model = build()
+    stats.update(products=int(chosen.sum()), lp_bound=bound)
+    return model, stats
+
+# --- Result Extraction ---
+def extract_results(df, quantities, budget):
+    """Collect the selected products and basket totals from per-row quantities.
+
+    The solution is taken as one vector and the non-zero rows are selected
+    with a mask; every total the reports need (cost, weight, items,
+    nutrients and a per-food-group breakdown) is computed here once.
+    """
+    q = np.round(np.asarray(quantities, dtype=float))
+    chosen = np.flatnonzero(q > 0)
+    qty = q[chosen]
+    selected = df.iloc[chosen]
+    price = catalog_prices(selected)
+    weight = selected["weight_g"].to_numpy(dtype=float)
+    nutrients = selected[list(NUTRIENTS)].to_numpy(dtype=float)
+    groups = selected["main_group"].to_numpy()
+    line_price = price * qty
+    line_weight = weight * qty
+    total_cost = float(line_price.sum())
+    
+    # Prepare results
+    results = {
+        'items': [],
+        'total_cost': total_cost,
+        'total_weight': float(line_weight.sum()),
+        'total_items': float(qty.sum()),
+        'budget_usage': (total_cost / budget) * 100,
+        'nutrients': dict(zip(NUTRIENTS, (nutrients.T @ qty).tolist())),
+        'groups': {},
+    }
+    for group in [g for g in FOOD_GROUPS + ['other'] if (groups == g).any()]:
+        mask = groups == group
+        results['groups'][group] = {
+            'products': int(mask.sum()),
+            'items': float(qty[mask].sum()),
+            'cost': float(line_price[mask].sum()),
+            'weight': float(line_weight[mask].sum()),
+        }
+    
+    # Collect items that were selected
+    sku = selected['sku'].tolist() if 'sku' in selected else [None] * len(selected)
+    columns = zip(sku, selected['name'].tolist(), selected['market'].tolist(), qty.astype(int).tolist(),
+                  price.tolist(), line_price.tolist(), selected['weight_g'].tolist(), line_weight.tolist(),
+                  *nutrients.T.tolist(), groups.tolist())
+    for sku_id, name, market, quantity, unit_price, total_price, unit_weight, total_weight, \
+            calories, protein, fat, carbs, category in columns:
+        results['items'].append({
+            'sku': sku_id,
+            'name': name,
+            'market': market,
+            'quantity': quantity,
+            'price_per_unit': unit_price,
+            'total_price': total_price,
+            'weight_per_unit': unit_weight,
+            'total_weight': total_weight,
+            'calories': calories,
+            'protein': protein,
+            'carbs': carbs,
+            'fat': fat,
+            'category': category,
+        })
+    return results
+
 # --- Optimization ---
-def optimize_shopping(df, tdee, protein_g, fat_g, carb_g, budget, days=30):
+def optimize_shopping(df, tdee, protein_g, fat_g, carb_g, budget, days=30, presolve=True,
+                      initial_solution=None, fast=False, backend='pulp', msg=True, shortlist=None,
+                      time_budget=None, target_gap=None, on_incumbent=None):
+    """Solve one user's basket and return the results dict, or None.
+
+    fast runs the LP-rounding heuristic, shortlist=K the shortlist-and-expand
+    solve, and time_budget/target_gap the anytime solve: the best basket
+    within time_budget seconds (default 30) or once within target_gap of
+    the bound, with on_incumbent(incumbent) called for every improvement
+    (returning False stops the search). Otherwise CBC or HiGHS solves the
+    full model with a 30 second limit.
+    """
     print(f"\n=== OPTIMIZATION PARAMETERS ===")
     print(f"Budget: {budget} TL")
     print(f"Required calories: {tdee * days:.0f} kcal")
@@ -252,7 +1825,7 @@ def optimize_shopping(df, tdee, protein_g, fat_g, carb_g, budget, days=30):
     
     # Check if we have enough products in each category
     print(f"\n=== CATEGORY ANALYSIS ===")
-    for group in ['vegetables', 'fruits', 'dairy', 'legumes', 'meat_fish', 'grains']:
+    for group in FOOD_GROUPS:
         group_products = df[df['main_group'] == group]
         print(f"{group}: {len(group_products)} products")
         if len(group_products) == 0:
@@ -260,10 +1833,10 @@ def optimize_shopping(df, tdee, protein_g, fat_g, carb_g, budget, days=30):
     
     # Check nutrition feasibility
     print(f"\n=== NUTRITION FEASIBILITY CHECK ===")
-    total_calories_available = df['calories'].sum() * 5  # Max 5 of each item
-    total_protein_available = df['protein'].sum() * 5
-    total_fat_available = df['fat'].sum() * 5
-    total_carbs_available = df['carbs'].sum() * 5
+    total_calories_available = df['calories'].sum() * MAX_UNITS_PER_PRODUCT
+    total_protein_available = df['protein'].sum() * MAX_UNITS_PER_PRODUCT
+    total_fat_available = df['fat'].sum() * MAX_UNITS_PER_PRODUCT
+    total_carbs_available = df['carbs'].sum() * MAX_UNITS_PER_PRODUCT
     
     print(f"Available calories (max): {total_calories_available:.0f} kcal")
     print(f"Required calories: {tdee * days:.0f} kcal")
@@ -289,188 +1862,708 @@ def optimize_shopping(df, tdee, protein_g, fat_g, carb_g, budget, days=30):
     print(f"Product price range: {min_cost:.2f} - {max_cost:.2f} TL")
     print(f"Average product price: {avg_cost:.2f} TL")
     print(f"Budget: {budget:.2f} TL")
-    print(f"Minimum budget needed (70%): {budget * 0.70:.2f} TL")
+    print(f"Minimum budget needed ({BUDGET_FLOOR:.0%}): {budget * BUDGET_FLOOR:.2f} TL")
+    
+    # Drop dominated products before they become variables. Shortlist mode
+    # skips it: reduced-cost pricing already screens the whole catalog, and
+    # the pairwise dominance pass costs more than the shortlist saves on the
+    # large catalogs that mode is for
+    if presolve and not (shortlist and not fast):
+        print(f"\n=== PRESOLVE ===")
+        with span('presolve'):
+            df, removed = presolve_dominated(df)
+        print(f"✅ Removed {removed} dominated products ({2 * removed} variables), {len(df)} remain")
+    
+    # Two-phase mode: solve on a shortlist grown by LP reduced costs
+    if shortlist and not fast:
+        print(f"\n=== SHORTLIST AND EXPAND (top {shortlist} per group and class) ===")
+        with span('solve'):
+            model, stats = solve_shortlist(df, tdee, protein_g, fat_g, carb_g, budget, days, k=shortlist,
+                                           backend=backend, msg=msg)
+        status = model.solve_info['status']
+        record_metrics(backend=backend, model=model.size(), shortlist=stats, solver=model.solve_info)
+        print(f"✅ {stats['products']} of {stats['catalog']} products in the final model "
+              f"({stats['lp_rounds']} LP and {stats['mip_rounds']} MIP rounds), status: {status}")
+        if status != "Optimal":
+            print(f"❌ No optimal solution found. Status: {status}")
+            return None
+        with span('extract'):
+            results = model.extract(budget)
+        results['shortlist'] = stats
+        results['proven'] = bool(model.solve_info.get('proven', True))
+        return results
     
     # Create optimization problem
     print(f"\n=== CREATING OPTIMIZATION PROBLEM ===")
-    prob = LpProblem("ShoppingList", LpMinimize)
-    n = len(df)
-    print(f"Creating {n} decision variables...")
-    
-    # Decision variables: number of each item to buy (0-5)
-    items = [LpVariable(f"x_{i}", lowBound=0, upBound=5, cat='Integer') for i in range(n)]
-    print(f"✅ Created {len(items)} item variables")
-    
-    # Binary variables for counting different items
-    y = [LpVariable(f"y_{i}", cat='Binary') for i in range(n)]
-    print(f"✅ Created {len(y)} binary variables")
-    
-    # Objective: minimize total cost
-    print("Setting objective function...")
-    prob += lpSum([items[i] * df.iloc[i]["price"] for i in range(n)])
-    print("✅ Objective function set")
-    
-    # Nutrition constraints (scaled for days)
-    print("Adding nutrition constraints...")
-    prob += lpSum([items[i] * df.iloc[i]["calories"] for i in range(n)]) >= tdee * days
-    prob += lpSum([items[i] * df.iloc[i]["protein"] for i in range(n)]) >= protein_g * days
-    prob += lpSum([items[i] * df.iloc[i]["fat"] for i in range(n)]) >= fat_g * days
-    prob += lpSum([items[i] * df.iloc[i]["carbs"] for i in range(n)]) >= carb_g * days
-    print("✅ Nutrition constraints added")
-    
-    # Budget constraints: use at least 70% of budget
-    print("Adding budget constraints...")
-    prob += lpSum([items[i] * df.iloc[i]["price"] for i in range(n)]) >= budget * 0.70
-    prob += lpSum([items[i] * df.iloc[i]["price"] for i in range(n)]) <= budget
-    print("✅ Budget constraints added")
-    
-    # Category diversity: at least 1 from each main group
-    print("Adding category diversity constraints...")
-    for group in ['vegetables', 'fruits', 'dairy', 'legumes', 'meat_fish', 'grains']:
-        indices = [i for i in range(n) if df.iloc[i]['main_group'] == group]
-        if indices:
-            prob += lpSum([items[i] for i in indices]) >= 1
-            print(f"  ✅ Added constraint for {group} ({len(indices)} products)")
-        else:
-            print(f"  ⚠️  No products in {group} category - skipping constraint")
-    print("✅ Category diversity constraints added")
-    
-    # Meat/Fish weight constraint: at least 7.5 kg
-    print("Adding meat/fish weight constraint...")
-    meat_indices = [i for i in range(n) if df.iloc[i]['main_group'] == 'meat_fish']
-    if meat_indices:
-        prob += lpSum([items[i] * df.iloc[i]["weight_g"] for i in meat_indices]) >= 7500  # 7.5 kg = 7500 g
-        print(f"  ✅ Added meat/fish weight constraint (at least 7.5 kg from {len(meat_indices)} products)")
-    else:
-        print(f"  ⚠️  No meat/fish products available")
-    print("✅ Meat/fish weight constraint added")
-    
-    # Pasta weight constraint: maximum 2.5 kg total
-    print("Adding pasta weight constraint...")
-    pasta_terms = ['makarna', 'pasta', 'spaghetti', 'penne', 'farfalle', 'rigatoni', 'şehriye', 'erişte']
-    pasta_indices = [i for i in range(n) if any(term in df.iloc[i]['name'].lower() for term in pasta_terms)]
-    if pasta_indices:
-        prob += lpSum([items[i] * df.iloc[i]["weight_g"] for i in pasta_indices]) <= 2500  # 2.5 kg = 2500 g
-        print(f"  ✅ Added pasta weight constraint (maximum 2.5 kg from {len(pasta_indices)} products)")
-    else:
-        print(f"  ⚠️  No pasta products available")
-    print("✅ Pasta weight constraint added")
-    
-    # Bulgur constraints: maximum 2.5 kg total and maximum 3 different items
-    print("Adding bulgur constraints...")
-    bulgur_terms = ['bulgur', 'bulguru', 'bulgurlu']
-    bulgur_indices = [i for i in range(n) if any(term in df.iloc[i]['name'].lower() for term in bulgur_terms)]
-    if bulgur_indices:
-        # Bulgur weight constraint: maximum 2.5 kg total
-        prob += lpSum([items[i] * df.iloc[i]["weight_g"] for i in bulgur_indices]) <= 2500  # 2.5 kg = 2500 g
-        # Bulgur variety constraint: maximum 3 different items
-        prob += lpSum([y[i] for i in bulgur_indices]) <= 3
-        print(f"  ✅ Added bulgur constraints (maximum 2.5 kg and 3 different items from {len(bulgur_indices)} products)")
-    else:
-        print(f"  ⚠️  No bulgur products available")
-    print("✅ Bulgur constraints added")
-    
-    # Pirinç constraints: maximum 2.5 kg total and maximum 3 different items
-    print("Adding pirinç constraints...")
-    pirinc_terms = ['pirinç', 'pirinçli', 'rice']
-    pirinc_indices = [i for i in range(n) if any(term in df.iloc[i]['name'].lower() for term in pirinc_terms)]
-    if pirinc_indices:
-        # Pirinç weight constraint: maximum 2.5 kg total
-        prob += lpSum([items[i] * df.iloc[i]["weight_g"] for i in pirinc_indices]) <= 2500  # 2.5 kg = 2500 g
-        # Pirinç variety constraint: maximum 3 different items
-        prob += lpSum([y[i] for i in pirinc_indices]) <= 3
-        print(f"  ✅ Added pirinç constraints (maximum 2.5 kg and 3 different items from {len(pirinc_indices)} products)")
-    else:
-        print(f"  ⚠️  No pirinç products available")
-    print("✅ Pirinç constraints added")
-    
-    # Weight constraint: maximum 50kg total
-    print("Adding weight constraint...")
-    prob += lpSum([items[i] * df.iloc[i]["weight_g"] for i in range(n)]) <= 50000
-    print("✅ Weight constraint added")
-    
-    # Product count constraint: maximum 200 products total
-    print("Adding product count constraint...")
-    prob += lpSum([items[i] for i in range(n)]) <= 200
-    print("✅ Product count constraint added")
-    
-    # Product variety constraint: at least 10 different items
-    print("Adding product variety constraints...")
-    for i in range(n):
-        prob += items[i] >= y[i]
-    prob += lpSum(y) >= 10
-    print("✅ Product variety constraints added")
+    with span('build'):
+        model = ShoppingModel(df, backend=backend)
+        model.set_targets(tdee, protein_g, fat_g, carb_g, budget, days)
+    
+    # MIP start from a previous or neighbouring basket
+    warm_start = None
+    if initial_solution:
+        mapped, feasible = model.set_initial_solution(initial_solution)
+        warm_start_stats['starts'] += 1
+        warm_start_stats['feasible_starts'] += int(feasible)
+        warm_start = {'mapped': mapped, 'feasible': feasible}
+        print(f"Warm start: {mapped} products mapped onto the catalog "
+              f"({'feasible' if feasible else 'infeasible'} for this model)")
+        if backend == 'highs':
+            print("⚠️  The HiGHS backend takes no MIP start - solving from scratch")
     
     # Problem statistics
     print(f"\n=== PROBLEM STATISTICS ===")
-    print(f"Total variables: {len(prob.variables())}")
-    print(f"Total constraints: {len(prob.constraints)}")
+    size = model.size()
+    record_metrics(backend=backend, model=size)
+    print(f"Total variables: {size['variables']}")
+    print(f"Total constraints: {size['constraints']}")
+    
+    # Anytime mode: stream improving baskets until the time budget or gap is reached
+    if time_budget is not None or target_gap is not None:
+        print(f"\n=== ANYTIME SOLVE (budget {time_budget or 30}s"
+              + (f", target gap {target_gap:.2%}" if target_gap is not None else "") + ") ===")
+        with span('solve'):
+            best = model.solve_anytime(time_budget or 30, target_gap, on_incumbent)
+        record_metrics(solver=model.solve_info)
+        if best is None:
+            print(f"❌ No feasible basket found. Status: {model.solve_info['status']}")
+            return None
+        results = best['results']
+        results['anytime'] = dict(model.solve_info)
+        results['proven'] = bool(model.solve_info['proven'])
+        gap = model.solve_info['gap']
+        print(f"✅ {model.solve_info['status']} basket: {results['total_cost']:.2f} TL"
+              + (f", gap {gap:.2%}" if gap is not None else "")
+              + f" after {model.solve_info['incumbents']} incumbents in {model.solve_info['seconds']:.1f}s")
+        return results
+    
+    # Fast mode: LP relaxation plus rounding/repair instead of the full MIP
+    if fast:
+        print(f"\n=== FAST MODE (LP RELAXATION + ROUNDING) ===")
+        with span('solve'):
+            results = model.solve_fast(time_limit=30)
+        record_metrics(solver={'status': "Feasible" if results else "Not Solved",
+                               **(results['fast'] if results else {})})
+        if results is None:
+            print("❌ Fast mode found no feasible basket - try the exact solver")
+            return None
+        fast_info = results['fast']
+        print(f"✅ Feasible basket: {results['total_cost']:.2f} TL, LP bound {fast_info['lp_bound']:.2f} TL "
+              f"(gap {fast_info['gap'] * 100:.2f}%) in {fast_info['seconds']:.2f}s")
+        return results
     
     # Solve the optimization problem
     print(f"\n=== SOLVING OPTIMIZATION PROBLEM ===")
-    print("Starting solver...")
+    print(f"Starting solver ({'HiGHS' if backend == 'highs' else 'CBC'})...")
     try:
-        prob.solve(PULP_CBC_CMD(msg=True, timeLimit=30))  # 30 second time limit
-        print(f"✅ Solver completed with status: {LpStatus[prob.status]}")
+        solve_start = time.perf_counter()
+        with span('solve'):
+            status = model.solve(time_limit=30, msg=msg, warm_start=warm_start is not None)  # 30 second time limit
+        solve_seconds = time.perf_counter() - solve_start
+        record_metrics(solver=model.solve_info)
+        print(f"✅ Solver completed with status: {status}")
     except Exception as e:
         print(f"❌ Solver error: {e}")
         return None
     
     # Check solution status
-    if LpStatus[prob.status] != "Optimal":
-        print(f"❌ No optimal solution found. Status: {LpStatus[prob.status]}")
-        if LpStatus[prob.status] == "Infeasible":
+    if status != "Optimal":
+        print(f"❌ No optimal solution found. Status: {status}")
+        if status == "Infeasible":
             print("The problem is infeasible - constraints are too strict")
             print("Try relaxing constraints or increasing budget")
-        elif LpStatus[prob.status] == "Unbounded":
+        elif status == "Unbounded":
             print("The problem is unbounded - check objective function")
-        elif LpStatus[prob.status] == "Not Solved":
+        elif status == "Not Solved":
             print("Solver did not complete - may need more time or different approach")
         return None
     
-    print("✅ Optimal solution found!")
+    if model.solve_info.get('proven', True):
+        print("✅ Optimal solution found!")
+    else:
+        # Keep the incumbent the time limit left us with rather than nothing
+        gap = model.solve_info.get('gap')
+        print("⚠️  Time limit reached - using the best basket found"
+              + (f" (gap {gap:.2%})" if gap is not None else ""))
     
     # Extract results
     print("Extracting results...")
-    total_cost = sum([value(items[i]) * df.iloc[i]["price"] for i in range(n)])
-    total_weight = sum([value(items[i]) * df.iloc[i]["weight_g"] for i in range(n)])
-    total_items = sum([value(items[i]) for i in range(n)])
+    with span('extract'):
+        results = model.extract(budget)
+    results['proven'] = bool(model.solve_info.get('proven', True))
+    if warm_start is not None:
+        results['warm_start'] = dict(warm_start, solve_seconds=solve_seconds)
+    print(f"✅ Results extracted: {len(results['items'])} different products selected")
+    return results
+
+# --- Solution Cache ---
+SOLUTION_CACHE_DIR = ".solution_cache"
+# Bucket widths of the cache key: per-day kcal, per-day grams of each macro, TL
+CACHE_STEPS = {'calories': 50, 'protein': 5, 'fat': 5, 'carbs': 10, 'budget': 100}
+FINGERPRINT_COLUMNS = ['name', 'market', 'price', 'weight_g', 'main_group', *NUTRIENTS]
+
+def catalog_fingerprint(df):
+    """Hash of the catalog contents the model sees, the active rules and the preprocessing version"""
+    digest = hashlib.sha256(pd.util.hash_pandas_object(df[FINGERPRINT_COLUMNS], index=False).to_numpy().tobytes())
+    digest.update(json.dumps([RULES, PREPROCESS_VERSION], sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+def _json_default(obj):
+    # NumPy scalars in the solver info attached to results
+    if hasattr(obj, "item"):
+        return obj.item()
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+class SolutionCache:
+    """Memoizes optimize_shopping by quantized targets, budget, days and catalog.
+
+    Targets and budget are bucketed by CACHE_STEPS. A cached basket counts as
+    a hit for a request in its bucket only if it also meets that request's
+    exact nutrition targets and budget window; otherwise, or when the nearest
+    cached basket is in a neighbouring bucket (at most `near` steps away in
+    every dimension), it is used as a MIP start for a fresh solve. Entries
+    live in a bounded LRU in memory and, with a path, as JSON files on disk.
+    Entries for any other catalog fingerprint are dropped as soon as a new
+    catalog is seen.
+    """
+    def __init__(self, maxsize=256, path=None, near=2, steps=None):
+        self.maxsize = maxsize
+        self.path = path
+        self.near = near
+        self.steps = dict(CACHE_STEPS, **(steps or {}))
+        self.entries = OrderedDict()
+        self.fingerprint = None
+        self.hits = self.warm_starts = self.misses = 0
+        if path:
+            os.makedirs(path, exist_ok=True)
+    
+    def bucket(self, tdee, protein_g, fat_g, carb_g, budget):
+        values = dict(zip((*NUTRIENTS, 'budget'), (tdee, protein_g, fat_g, carb_g, budget)))
+        return tuple(int(values[name] // self.steps[name]) for name in (*NUTRIENTS, 'budget'))
+    
+    def _use_catalog(self, fingerprint):
+        if fingerprint != self.fingerprint:
+            self.fingerprint = fingerprint
+            self.invalidate(keep=fingerprint)
+    
+    def invalidate(self, keep=None):
+        """Drop every entry (memory and disk) not made for catalog fingerprint keep"""
+        for key in [key for key in self.entries if key[0] != keep]:
+            del self.entries[key]
+        if self.path:
+            for file in os.listdir(self.path):
+                if file.endswith(".json") and not (keep and file.startswith(keep + "-")):
+                    os.remove(os.path.join(self.path, file))
+    
+    def _file(self, key):
+        return os.path.join(self.path, f"{key[0]}-{hashlib.sha256(repr(key[1:]).encode()).hexdigest()[:16]}.json")
+    
+    def get(self, key):
+        """Cached entry for key, from memory or disk, or None"""
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        if self.path and os.path.exists(self._file(key)):
+            with open(self._file(key), encoding="utf-8") as f:
+                entry = json.load(f)
+            self._remember(key, entry)
+            return entry
+        return None
     
-    # Prepare results
-    results = {
-        'items': [],
-        'total_cost': total_cost,
-        'total_weight': total_weight,
-        'total_items': total_items,
-        'budget_usage': (total_cost / budget) * 100
+    def put(self, key, entry):
+        self._remember(key, entry)
+        if self.path:
+            with open(self._file(key), "w", encoding="utf-8") as f:
+                json.dump(entry, f, default=_json_default, ensure_ascii=False)
+    
+    def _remember(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+    
+    def nearest(self, key):
+        """In-memory entry of the closest neighbouring bucket, or None"""
+        best, best_distance = None, None
+        for other, entry in self.entries.items():
+            if other[:2] != key[:2] or other == key:
+                continue
+            steps = [abs(a - b) for a, b in zip(other[2], key[2])]
+            if max(steps) <= self.near and (best is None or sum(steps) < best_distance):
+                best, best_distance = entry, sum(steps)
+        return best
+    
+    @staticmethod
+    def fits(results, tdee, protein_g, fat_g, carb_g, budget, days):
+        """Whether a basket meets these exact nutrition targets and budget window"""
+        targets = dict(zip(NUTRIENTS, np.array([tdee, protein_g, fat_g, carb_g]) * days))
+        return (all(results['nutrients'][name] >= targets[name] - 1e-6 for name in NUTRIENTS)
+                and budget * BUDGET_FLOOR - 1e-6 <= results['total_cost'] <= budget + 1e-6)
+    
+    def lookup(self, fingerprint, tdee, protein_g, fat_g, carb_g, budget, days=30, fast=False):
+        """Look a request up; returns (key, results, start).
+
+        results is the cached basket on a hit (else None); on a near miss
+        start is a cached basket to warm-start the solve from. Pass key and
+        the solved results to store() afterwards.
+        """
+        self._use_catalog(fingerprint)
+        key = (fingerprint, (days, 'fast' if fast else 'exact'), self.bucket(tdee, protein_g, fat_g, carb_g, budget))
+        entry = self.get(key)
+        if entry is not None and self.fits(entry['results'], tdee, protein_g, fat_g, carb_g, budget, days):
+            self.hits += 1
+            results = dict(entry['results'], budget_usage=entry['results']['total_cost'] / budget * 100)
+            return key, results, None
+        start = entry or self.nearest(key)
+        if start is not None and not fast:
+            self.warm_starts += 1
+            return key, None, start['results']
+        self.misses += 1
+        return key, None, None
+    
+    def store(self, key, results, targets):
+        """Cache a solved basket; returns False (and skips it) unless it was proven optimal.
+
+        A time-limited or anytime basket stored under the exact key would be
+        served as a hit to requests whose true optimum is cheaper.
+        """
+        if not results.get('proven', True):
+            return False
+        self.put(key, {'targets': list(targets), 'results': results})
+        return True
+    
+    def optimize(self, df, tdee, protein_g, fat_g, carb_g, budget, days=30, fingerprint=None, **options):
+        """optimize_shopping through the cache; results['cache'] says 'hit', 'warm' or 'miss'.
+
+        fingerprint defaults to catalog_fingerprint(df); pass it when calling
+        repeatedly with the same catalog to skip rehashing it.
+        """
+        key, results, start = self.lookup(fingerprint or catalog_fingerprint(df), tdee, protein_g, fat_g,
+                                          carb_g, budget, days, options.get('fast', False))
+        if results is not None:
+            return dict(results, cache='hit')
+        if start is not None:
+            options.setdefault('initial_solution', start)
+        results = optimize_shopping(df, tdee, protein_g, fat_g, carb_g, budget, days, **options)
+        if results is None:
+            return None
+        self.store(key, results, (tdee, protein_g, fat_g, carb_g, budget))
+        return dict(results, cache='warm' if start is not None else 'miss')
+    
+    def stats(self):
+        """Lookup counts and rates; warm starts are near misses solved from a cached basket"""
+        lookups = self.hits + self.warm_starts + self.misses
+        return {
+            'lookups': lookups,
+            'hits': self.hits,
+            'warm_starts': self.warm_starts,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'warm_start_rate': self.warm_starts / lookups if lookups else 0.0,
+            'entries': len(self.entries),
+        }
+
+# --- Batch Optimization ---
+def profile_targets(profile):
+    """(tdee, protein_g, fat_g, carb_g) for a profile dict"""
+    tdee = calculate_tdee(profile['age'], profile['gender'], profile['weight'],
+                          profile['height'], profile['activity'])
+    return get_macro_targets(tdee, profile['goal'])
+
+# Model template owned by each optimize_many worker process
+_worker_model = None
+
+def _init_batch_worker(df, backend='pulp', rules=None):
+    global _worker_model
+    if rules is not None:
+        use_rules(rules)  # spawn-started workers re-import the default rules
+    with contextlib.redirect_stdout(io.StringIO()):
+        _worker_model = ShoppingModel(df, backend=backend)
+
+def _solve_profile(profile, time_limit, fast=False, initial_solution=None):
+    start = time.perf_counter()
+    tdee, protein_g, fat_g, carb_g = profile_targets(profile)
+    budget = profile['budget']
+    _worker_model.set_targets(tdee, protein_g, fat_g, carb_g, budget, profile.get('days', 30))
+    if fast:
+        results = _worker_model.solve_fast(time_limit=time_limit)
+        status = "Feasible" if results is not None else "Not Solved"
+    else:
+        if initial_solution is not None:
+            _worker_model.set_initial_solution(initial_solution)
+        status = _worker_model.solve(time_limit=time_limit, msg=False,
+                                     warm_start=initial_solution is not None)
+        results = _worker_model.extract(budget) if status == "Optimal" else None
+        if results is not None:
+            results['proven'] = bool(_worker_model.solve_info.get('proven', True))
+    return {'profile': profile, 'status': status, 'results': results,
+            'seconds': time.perf_counter() - start}
+
+def optimize_many(profiles, df=None, workers=None, time_limit=30, presolve=True, backend='pulp'):
+    """Solve many user profiles against one catalog.
+
+    Each profile is a dict with age, gender, weight, height, activity, goal,
+    budget and optionally days (default 30), checked with validate_profile.
+    Every worker process builds the ShoppingModel once and then only updates
+    its right-hand sides per profile. Returns {'results': [...], 'summary':
+    {...}} with one entry per profile in input order and the aggregate
+    throughput; a profile that fails validation gets status 'Invalid' and
+    one whose solve raised status 'Error', both with the message under
+    'error', and the rest of the run goes on.
+    """
+    if df is None:
+        df = compact_catalog(canonicalize_products(load_catalog())[0])
+    if presolve:
+        df, _ = presolve_dominated(df)
+    workers = workers or os.cpu_count() or 1
+    
+    outcomes = [None] * len(profiles)
+    valid = []
+    for number, profile in enumerate(profiles):
+        try:
+            if not isinstance(profile, dict):
+                raise ValueError("a profile must be a dict")
+            valid.append((number, validate_profile(profile)))
+        except ValueError as e:
+            outcomes[number] = {'profile': profile, 'status': "Invalid", 'error': str(e), 'results': None,
+                                'seconds': 0.0}
+    start = time.perf_counter()
+    for number, outcome in stream_solutions(valid, df, workers, time_limit, backend):
+        outcomes[number] = outcome
+    elapsed = time.perf_counter() - start
+    
+    summary = {
+        'profiles': len(profiles),
+        'solved': sum(outcome['status'] == "Optimal" for outcome in outcomes),
+        'workers': workers,
+        'seconds': elapsed,
+        'profiles_per_second': len(profiles) / elapsed if elapsed else 0.0,
     }
+    print(f"✅ Solved {summary['solved']}/{summary['profiles']} profiles in {elapsed:.1f}s "
+          f"on {workers} workers ({summary['profiles_per_second']:.2f} profiles/s)")
+    return {'results': outcomes, 'summary': summary}
+
+def stream_solutions(profiles, df, workers=1, time_limit=30, backend='pulp', fast=False):
+    """Yield (key, outcome) for (key, profile) pairs in the order they finish.
+
+    Outcomes are those of optimize_many, or status 'Error' with the message
+    if a solve raised. With one worker the model is built and solved in this
+    process; otherwise at most two profiles per worker are in flight, so
+    profiles can be a lazily read stream of any length.
+    """
+    def failed(profile, e):
+        return {'profile': profile, 'status': "Error", 'error': str(e), 'results': None, 'seconds': 0.0}
+    
+    if workers <= 1:
+        _init_batch_worker(df, backend)
+        for key, profile in profiles:
+            try:
+                yield key, _solve_profile(profile, time_limit, fast)
+            except Exception as e:
+                yield key, failed(profile, e)
+        return
     
-    # Collect items that were selected
-    selected_count = 0
-    for i, var in enumerate(items):
-        qty = value(var)
-        if qty and qty >= 1:
-            selected_count += 1
-            item_info = {
-                'name': df.iloc[i]['name'],
-                'market': df.iloc[i]['market'],
-                'quantity': int(qty),
-                'price_per_unit': df.iloc[i]['price'],
-                'total_price': df.iloc[i]['price'] * qty,
-                'weight_per_unit': df.iloc[i]['weight_g'],
-                'total_weight': df.iloc[i]['weight_g'] * qty,
-                'calories': df.iloc[i]['calories'],
-                'protein': df.iloc[i]['protein'],
-                'carbs': df.iloc[i]['carbs'],
-                'fat': df.iloc[i]['fat'],
-                'category': df.iloc[i]['main_group']
-            }
-            results['items'].append(item_info)
-    
-    print(f"✅ Results extracted: {selected_count} different products selected")
-    return results
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+    profiles = iter(profiles)
+    pending = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker,
+                             initargs=(df, backend, RULES)) as pool:
+        while True:
+            for key, profile in profiles:
+                pending[pool.submit(_solve_profile, profile, time_limit, fast)] = key, profile
+                if len(pending) >= 2 * workers:
+                    break
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                key, profile = pending.pop(future)
+                try:
+                    yield key, future.result()
+                except Exception as e:
+                    yield key, failed(profile, e)
+
+def run_batch(lines, out, df, workers=1, time_limit=30, backend='pulp', fast=False, offers=None):
+    """Solve a JSONL stream of profiles, writing one JSON result line per profile.
+
+    Each non-blank line is checked with parse_profile; a bad one gets a
+    status 'Invalid' record straight away. Solved profiles are written as
+    soon as they finish (so not in input order) as {'line', 'profile',
+    'status', 'seconds', 'results'}, and out is flushed after every line;
+    given the offers frame, every basket item carries its offer list.
+    Returns a summary with counts per status and the throughput.
+    """
+    counts = {}
+    
+    def emit(record):
+        counts[record['status']] = counts.get(record['status'], 0) + 1
+        out.write(json.dumps(record, ensure_ascii=False, default=_json_default) + "\n")
+        out.flush()
+    
+    def valid_profiles():
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                yield number, parse_profile(line)
+            except ValueError as e:
+                emit({'line': number, 'status': "Invalid", 'error': str(e)})
+    
+    start = time.perf_counter()
+    for number, outcome in stream_solutions(valid_profiles(), df, workers, time_limit, backend, fast):
+        if offers is not None and outcome['results'] is not None:
+            attach_offers(outcome['results'], offers)
+        emit({'line': number, **outcome})
+    elapsed = time.perf_counter() - start
+    total = sum(counts.values())
+    return {'profiles': total, 'statuses': counts, 'workers': workers, 'seconds': elapsed,
+            'profiles_per_second': total / elapsed if elapsed else 0.0}
+
+# --- Weekly Baskets ---
+def split_weeks(days, week_days=7):
+    """Lengths of the weekly baskets covering days, e.g. 30 -> [8, 8, 7, 7]"""
+    weeks = max(round(days / week_days), 1)
+    return [len(part) for part in np.array_split(np.arange(days), weeks)]
+
+# Catalog and per-length weekly models owned by each optimize_weekly worker
+_week_catalog = None
+_week_models = {}
+
+def _init_week_worker(df, backend='pulp', rules=None):
+    global _week_catalog
+    if rules is not None:
+        use_rules(rules)
+    _week_catalog = (df, backend)
+    _week_models.clear()
+
+def _solve_week(days, targets, budget, time_limit):
+    start = time.perf_counter()
+    if days not in _week_models:
+        df, backend = _week_catalog
+        with contextlib.redirect_stdout(io.StringIO()):
+            _week_models[days] = ShoppingModel(df, backend=backend, period_days=days)
+    model = _week_models[days]
+    model.set_targets(*targets, budget, days)
+    status = model.solve(time_limit=time_limit, msg=False)
+    results = model.extract(budget) if status == "Optimal" else None
+    return {'status': status, 'results': results, 'proven': bool(model.solve_info.get('proven')),
+            'seconds': time.perf_counter() - start}
+
+def optimize_weekly(df, tdee, protein_g, fat_g, carb_g, budget, days=30, week_days=7, workers=None,
+                    time_limit=30, presolve=True, backend='pulp', rounds=3, compare=False):
+    """Plan the horizon as weekly baskets that share one budget.
+
+    The horizon is split with split_weeks and every week gets its pro-rata
+    share of the nutrition targets, the amount limits and the budget, which
+    makes the weeks independent sub-MIPs; they are solved concurrently on a
+    pool of worker processes. Weeks of the same length and budget are the
+    same sub-problem and are solved once. A week that is infeasible on its
+    share receives the budget the solved weeks left unspent and is solved
+    again, for up to `rounds` rounds.
+    
+    The per-product unit cap, the variety floor and the class distinct caps
+    hold per week rather than over the horizon, so the plan solves a looser
+    problem than a single basket does, not an approximation of it.
+    
+    Returns {'weeks': [...], 'summary': {...}} with one entry per week;
+    summary['proven'] counts the weeks proven optimal within time_limit.
+    With compare=True the whole horizon is also solved as one basket and the
+    summary reports its cost and solve time next to the plan's as
+    'single_basket', with 'cost_difference' the plan's cost relative to it.
+    That difference compares two problems, not the quality of the weekly
+    solve.
+    """
+    if presolve:
+        df, _ = presolve_dominated(df)
+    lengths = split_weeks(days, week_days)
+    targets = (tdee, protein_g, fat_g, carb_g)
+    budgets = [budget * length / days for length in lengths]
+    weeks = [None] * len(lengths)
+    workers = min(workers or os.cpu_count() or 1, len(set(lengths)))
+    sub_solves = 0
+    
+    from concurrent.futures import ProcessPoolExecutor
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_week_worker,
+                             initargs=(df, backend, RULES)) as pool:
+        for _ in range(rounds):
+            pending = [k for k, week in enumerate(weeks) if week is None or week['results'] is None]
+            if not pending:
+                break
+            if any(week is not None for week in weeks):
+                # Move what the solved weeks left unspent to the infeasible ones
+                spent = sum(week['results']['total_cost'] for week in weeks if week and week['results'])
+                spare = budget - spent - sum(budgets[k] for k in pending)
+                if spare <= 1e-6:
+                    break
+                pending_days = sum(lengths[k] for k in pending)
+                for k in pending:
+                    budgets[k] += spare * lengths[k] / pending_days
+            tasks = {(lengths[k], round(budgets[k], 6)) for k in pending}
+            futures = {task: pool.submit(_solve_week, task[0], targets, task[1], time_limit) for task in tasks}
+            sub_solves += len(futures)
+            for k in pending:
+                outcome = futures[(lengths[k], round(budgets[k], 6))].result()
+                weeks[k] = {'week': k + 1, 'days': lengths[k], 'budget': budgets[k], **outcome}
+    elapsed = time.perf_counter() - start
+    
+    solved = [week for week in weeks if week['results'] is not None]
+    summary = {
+        'weeks': len(weeks),
+        'solved': len(solved),
+        'status': "Optimal" if len(solved) == len(weeks) else "Infeasible",
+        'total_cost': sum(week['results']['total_cost'] for week in solved),
+        'proven': sum(week['proven'] for week in solved),
+        'budget': budget,
+        'sub_solves': sub_solves,
+        'workers': workers,
+        'seconds': elapsed,
+    }
+    print(f"✅ Solved {len(solved)}/{len(weeks)} weekly baskets ({sub_solves} sub-MIPs, {workers} workers, "
+          f"{summary['proven']} proven optimal) in {elapsed:.1f}s, total {summary['total_cost']:.2f} TL")
+    
+    if compare:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            model = ShoppingModel(df, backend=backend, period_days=days)
+        model.set_targets(tdee, protein_g, fat_g, carb_g, budget, days)
+        status = model.solve(time_limit=time_limit, msg=False)
+        single = {'status': status, 'proven': bool(model.solve_info.get('proven')),
+                  'seconds': time.perf_counter() - start,
+                  'total_cost': model.extract(budget)['total_cost'] if status == "Optimal" else None}
+        summary['single_basket'] = single
+        if single['total_cost'] and summary['status'] == "Optimal":
+            summary['cost_difference'] = summary['total_cost'] / single['total_cost'] - 1
+            print(f"📏 Single {days}-day basket: {single['total_cost']:.2f} TL in {single['seconds']:.1f}s "
+                  f"(weekly plan costs {summary['cost_difference']:+.1%} under per-week limits)")
+    return {'weeks': weeks, 'summary': summary}
+
+def display_weekly(plan, tdee, protein_g, fat_g, carb_g):
+    """Print every weekly basket followed by the plan totals"""
+    for week in plan['weeks']:
+        print(f"\n📅 WEEK {week['week']} ({week['days']} days, budget {week['budget']:.2f} TL)")
+        if week['results'] is None:
+            print(f"❌ No feasible basket (solver status: {week['status']})")
+            continue
+        display_results(week['results'], week['budget'], tdee, protein_g, fat_g, carb_g, week['days'])
+    summary = plan['summary']
+    print("\n" + "="*60)
+    print("📊 WEEKLY PLAN SUMMARY")
+    print("="*60)
+    print(f"💰 Total Cost: {summary['total_cost']:.2f} TL ({summary['total_cost'] / summary['budget'] * 100:.1f}% of budget)")
+    print(f"📅 Weeks solved: {summary['solved']}/{summary['weeks']}")
+    print(f"⏱️  Solve time: {summary['seconds']:.1f}s ({summary['sub_solves']} sub-MIPs on {summary['workers']} workers, "
+          f"{summary['proven']}/{summary['solved']} weeks proven optimal)")
+    single = summary.get('single_basket')
+    if single and single['total_cost'] is not None:
+        print(f"📏 Single basket: {single['total_cost']:.2f} TL in {single['seconds']:.1f}s"
+              f"{'' if single['proven'] else ' (not proven optimal)'}")
+        if 'cost_difference' in summary:
+            print(f"   Weekly shopping costs {summary['cost_difference']:+.1%} against it. The unit cap, variety "
+                  f"floor and class variety caps hold per week there, so this is a different problem, "
+                  f"not a measure of the weekly solve's quality")
+
+# --- Budget / Nutrition Sweep ---
+FRONTIER_COLUMNS = ['budget', 'scale', 'status', 'total_cost', 'calories', 'protein', 'fat', 'carbs',
+                    'total_items', 'products', 'solve_seconds', 'pareto']
+
+def parse_sweep_values(text):
+    """Parse "2000,3000,4000" or an inclusive "start:stop:step" range.
+
+    Used as an argparse type: bad input raises ArgumentTypeError, which
+    argparse reports as a usage error.
+    """
+    try:
+        if ':' in text:
+            start, stop, step = (float(part) for part in text.split(':'))
+            if not step > 0:
+                raise argparse.ArgumentTypeError(f"step must be positive in {text!r}")
+            values = [float(v) for v in np.arange(start, stop + step / 2, step)]
+        else:
+            values = [float(part) for part in text.split(',') if part.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected numbers as \"a,b,c\" or \"start:stop:step\", got {text!r}") from None
+    if not values:
+        raise argparse.ArgumentTypeError(f"no values in {text!r}")
+    if not all(math.isfinite(v) and v > 0 for v in values):
+        raise argparse.ArgumentTypeError(f"values must be positive numbers, got {text!r}")
+    return values
+
+def _mark_pareto(rows):
+    """Flag solved points that no other point beats on cost and every nutrient"""
+    solved = [row for row in rows if row['total_cost'] is not None]
+    keys = ['calories', 'protein', 'fat', 'carbs']
+    for row in rows:
+        row['pareto'] = False
+    for row in solved:
+        row['pareto'] = not any(
+            other['total_cost'] <= row['total_cost']
+            and all(other[k] >= row[k] for k in keys)
+            and (other['total_cost'] < row['total_cost'] or any(other[k] > row[k] for k in keys))
+            for other in solved
+        )
+
+def sweep(df, tdee, protein_g, fat_g, carb_g, budgets, scales=(1.0,), days=30,
+          time_limit=30, presolve=True, backend='pulp'):
+    """Solve one profile over a grid of budgets and macro-target scales.
+
+    The catalog is presolved and the model built once; each point only moves
+    the right-hand sides and is warm-started from the previous point's
+    basket. Returns one row per (scale, budget) point, FRONTIER_COLUMNS keys,
+    with 'pareto' marking the cost-versus-nutrition frontier.
+    """
+    if presolve:
+        df, _ = presolve_dominated(df)
+    with contextlib.redirect_stdout(io.StringIO()):
+        model = ShoppingModel(df, backend=backend)
+    
+    rows = []
+    previous = None
+    for scale in scales:
+        for budget in budgets:
+            model.set_targets(tdee * scale, protein_g * scale, fat_g * scale, carb_g * scale, budget, days)
+            if previous is not None:
+                model.set_initial_solution(previous)
+            start = time.perf_counter()
+            status = model.solve(time_limit=time_limit, msg=False, warm_start=previous is not None)
+            row = dict.fromkeys(FRONTIER_COLUMNS)
+            row.update(budget=budget, scale=scale, status=status,
+                       solve_seconds=round(time.perf_counter() - start, 3))
+            if status == "Optimal":
+                results = model.extract(budget)
+                previous = results
+                row.update(
+                    total_cost=round(float(results['total_cost']), 2),
+                    total_items=int(results['total_items']),
+                    products=len(results['items']),
+                    **{k: round(results['nutrients'][k], 1) for k in NUTRIENTS},
+                )
+            print(f"  budget {budget:.0f} TL, targets x{scale:g}: {status}"
+                  + (f", {row['total_cost']:.2f} TL" if row['total_cost'] is not None else ""))
+            rows.append(row)
+    _mark_pareto(rows)
+    return rows
+
+def save_frontier(rows, path):
+    """Write sweep rows as JSON (.json) or CSV (anything else)"""
+    if path.lower().endswith('.json'):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+    else:
+        pd.DataFrame(rows, columns=FRONTIER_COLUMNS).to_csv(path, index=False)
+    print(f"💾 Frontier saved to {path}")
 
 # --- Display Results ---
+def other_offers(item):
+    """Other markets and prices the item is offered at, e.g. 'migros 45.00 TL, a101 47.50 TL'"""
+    seen = {(item['market'], item['price_per_unit'])}
+    listed = []
+    for offer in item.get('offers', []):
+        if (offer['market'], offer['price']) not in seen:
+            seen.add((offer['market'], offer['price']))
+            listed.append(f"{offer['market']} {offer['price']:.2f} TL")
+    return ", ".join(listed)
+
 def display_results(results, budget, tdee, protein_g, fat_g, carb_g, days):
     if results is None:
         return
@@ -483,6 +2576,8 @@ def display_results(results, budget, tdee, protein_g, fat_g, carb_g, days):
     for item in results['items']:
         print(f"• {item['name']} ({item['market']})")
         print(f"  {item['quantity']} adet - {item['total_price']:.2f} TL, {item['total_weight']/1000:.2f} kg")
+        if other_offers(item):
+            print(f"  also at: {other_offers(item)}")
     
     # Summary
     print("\n" + "="*60)
@@ -494,16 +2589,21 @@ def display_results(results, budget, tdee, protein_g, fat_g, carb_g, days):
     print(f"🛒 Different Products: {len(results['items'])}")
     
     # Nutrition summary
-    total_calories = sum([item['calories'] * item['quantity'] for item in results['items']])
-    total_protein = sum([item['protein'] * item['quantity'] for item in results['items']])
-    total_fat = sum([item['fat'] * item['quantity'] for item in results['items']])
-    total_carbs = sum([item['carbs'] * item['quantity'] for item in results['items']])
-    
+    totals = results['nutrients']
     print(f"\n🍎 NUTRITION SUMMARY (for {days} days):")
-    print(f"  Calories: {total_calories:.0f} kcal (target: {tdee*days:.0f} kcal)")
-    print(f"  Protein: {total_protein:.0f} g (target: {protein_g*days:.0f} g)")
-    print(f"  Fat: {total_fat:.0f} g (target: {fat_g*days:.0f} g)")
-    print(f"  Carbs: {total_carbs:.0f} g (target: {carb_g*days:.0f} g)")
+    print(f"  Calories: {totals['calories']:.0f} kcal (target: {tdee*days:.0f} kcal)")
+    print(f"  Protein: {totals['protein']:.0f} g (target: {protein_g*days:.0f} g)")
+    print(f"  Fat: {totals['fat']:.0f} g (target: {fat_g*days:.0f} g)")
+    print(f"  Carbs: {totals['carbs']:.0f} g (target: {carb_g*days:.0f} g)")
+    
+    print(f"\n🥗 FOOD GROUPS:")
+    for group, group_totals in results['groups'].items():
+        print(f"  {group}: {int(group_totals['items'])} items, {group_totals['cost']:.2f} TL, "
+              f"{group_totals['weight']/1000:.2f} kg")
+
+def print_incumbent(incumbent):
+    gap = f", gap {incumbent['gap']:.2%}" if incumbent['gap'] is not None else ""
+    print(f"  ⏱️  {incumbent['seconds']:5.1f}s  {incumbent['cost']:.2f} TL{gap} ({incumbent['source']})")
 
 # --- Save Results to File ---
 def save_results_to_file(results, budget, tdee, protein_g, fat_g, carb_g, days):
@@ -522,6 +2622,8 @@ def save_results_to_file(results, budget, tdee, protein_g, fat_g, carb_g, days):
         for item in results['items']:
             f.write(f"• {item['name']} ({item['market']})\n")
             f.write(f"  {item['quantity']} adet - {item['total_price']:.2f} TL, {item['total_weight']/1000:.2f} kg\n")
+            if other_offers(item):
+                f.write(f"  also at: {other_offers(item)}\n")
         f.write("\n")
         
         # Summary
@@ -534,31 +2636,192 @@ def save_results_to_file(results, budget, tdee, protein_g, fat_g, carb_g, days):
         f.write(f"🛒 Different Products: {len(results['items'])}\n")
         
         # Nutrition summary
-        total_calories = sum([item['calories'] * item['quantity'] for item in results['items']])
-        total_protein = sum([item['protein'] * item['quantity'] for item in results['items']])
-        total_fat = sum([item['fat'] * item['quantity'] for item in results['items']])
-        total_carbs = sum([item['carbs'] * item['quantity'] for item in results['items']])
-        
+        totals = results['nutrients']
         f.write(f"\n🍎 NUTRITION SUMMARY (for {days} days):\n")
-        f.write(f"  Calories: {total_calories:.0f} kcal (target: {tdee*days:.0f} kcal)\n")
-        f.write(f"  Protein: {total_protein:.0f} g (target: {protein_g*days:.0f} g)\n")
-        f.write(f"  Fat: {total_fat:.0f} g (target: {fat_g*days:.0f} g)\n")
-        f.write(f"  Carbs: {total_carbs:.0f} g (target: {carb_g*days:.0f} g)\n")
+        f.write(f"  Calories: {totals['calories']:.0f} kcal (target: {tdee*days:.0f} kcal)\n")
+        f.write(f"  Protein: {totals['protein']:.0f} g (target: {protein_g*days:.0f} g)\n")
+        f.write(f"  Fat: {totals['fat']:.0f} g (target: {fat_g*days:.0f} g)\n")
+        f.write(f"  Carbs: {totals['carbs']:.0f} g (target: {carb_g*days:.0f} g)\n")
+        
+        f.write(f"\n🥗 FOOD GROUPS:\n")
+        for group, group_totals in results['groups'].items():
+            f.write(f"  {group}: {int(group_totals['items'])} items, {group_totals['cost']:.2f} TL, "
+                    f"{group_totals['weight']/1000:.2f} kg\n")
     
     print("💾 Results saved to shopping_output.txt")
 
+# --- Background Catalog Load ---
+def load_compact_catalog(csv_path, previous_csv=None):
+    """Load (or diff-update) a catalog snapshot, merge it into SKUs and compact it.
+
+    Returns (skus, offers), both compacted; offers feeds attach_offers.
+    """
+    if previous_csv:
+        with span('update'):
+            df, stats = update_catalog(previous_csv, csv_path)
+        record_metrics(snapshot_diff=stats)
+    else:
+        df = load_catalog(csv_path)
+    with span('canonicalize'):
+        df, offers = canonicalize_products(df)
+        full_bytes = catalog_memory(df)
+        df, offers = compact_catalog(df), compact_catalog(offers)
+    record_metrics(catalog_bytes={'full': full_bytes, 'compact': catalog_memory(df)})
+    return df, offers
+
+class BackgroundCatalog:
+    """Runs load_compact_catalog on a worker thread while the questions are asked.
+
+    Until result() is called this object stands in for sys.stdout: the
+    worker's progress messages are held back, so they never land in the
+    middle of a prompt, and everything else is passed through.
+    """
+    def __init__(self, csv_path, previous_csv=None):
+        self.catalog = self.error = None
+        self.held = io.StringIO()
+        self.stdout = sys.stdout
+        self.thread = threading.Thread(target=self._load, args=(csv_path, previous_csv),
+                                       name="catalog-load", daemon=True)
+        sys.stdout = self
+        self.thread.start()
+    
+    def _load(self, csv_path, previous_csv):
+        try:
+            self.catalog = load_compact_catalog(csv_path, previous_csv)
+        except BaseException as e:
+            self.error = e
+    
+    def write(self, text):
+        if threading.current_thread() is self.thread:
+            return self.held.write(text)
+        return self.stdout.write(text)
+    
+    def __getattr__(self, name):
+        return getattr(self.stdout, name)
+    
+    def result(self, replay=True):
+        """Wait for the catalog, print the held messages (if replay) and return (skus, offers)"""
+        with span('catalog_wait'):
+            self.thread.join()
+        sys.stdout = self.stdout
+        if replay:
+            print(self.held.getvalue(), end="")
+        if self.error is not None:
+            raise self.error
+        return self.catalog
+
+# --- JSONL Batch Mode ---
+def batch_main(args):
+    """--batch: progress goes to stderr so stdout carries only the JSONL results"""
+    with contextlib.redirect_stdout(sys.stderr), quiet_output(args.quiet):
+        print("📂 Loading data...")
+        df, offers = load_compact_catalog(args.catalog, args.previous_catalog)
+        with span('presolve'):
+            df, _ = presolve_dominated(df)
+        print(f"🧮 Solving profiles from {'stdin' if args.batch == '-' else args.batch}...")
+    
+    workers = args.workers or 1
+    with contextlib.ExitStack() as stack:
+        lines = sys.stdin if args.batch == "-" else stack.enter_context(open(args.batch, encoding="utf-8"))
+        out = stack.enter_context(open(args.output, "a", encoding="utf-8")) if args.output else sys.stdout
+        # Anything the solvers print in this process goes to stderr too
+        with contextlib.redirect_stdout(sys.stderr), span('batch'):
+            summary = run_batch(lines, out, df, workers, backend=args.backend, fast=args.fast, offers=offers)
+    
+    record_metrics(batch=summary)
+    with contextlib.redirect_stdout(sys.stderr), quiet_output(args.quiet):
+        statuses = ", ".join(f"{count} {status}" for status, count in sorted(summary['statuses'].items()))
+        print(f"✅ {summary['profiles']} profiles ({statuses or 'none'}) in {summary['seconds']:.1f}s "
+              f"on {workers} workers ({summary['profiles_per_second']:.2f} profiles/s)")
+    if args.metrics:
+        # stdout carries only results, so "-" means stderr here
+        write_metrics(args.metrics, stdout=sys.stderr)
+
 # --- Main Function ---
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Shopping Optimizer v2.0")
+    parser.add_argument("--sweep", metavar="BUDGETS", type=parse_sweep_values,
+                        help='sweep budgets instead of a single solve: "2000,3000" or "2000:4000:500"')
+    parser.add_argument("--scales", default="1.0", type=parse_sweep_values,
+                        help='macro-target scales for --sweep: "0.9,1.0,1.1" or "start:stop:step"')
+    parser.add_argument("--frontier", default="frontier.csv",
+                        help="frontier output for --sweep (.csv or .json)")
+    parser.add_argument("--weekly", action="store_true",
+                        help="plan weekly baskets sharing the monthly budget, solved in parallel")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="solver processes for --weekly (default: CPU count) and --batch (default: 1)")
+    parser.add_argument("--fast", action="store_true",
+                        help="sub-second LP relaxation + rounding heuristic instead of the exact MIP")
+    parser.add_argument("--refine", action="store_true",
+                        help="run --fast, then refine its basket with the exact MIP")
+    parser.add_argument("--shortlist", type=int, metavar="K",
+                        help="solve on the K most cost-efficient products per group and class, "
+                             "expanded by LP reduced costs until it matches the full model")
+    parser.add_argument("--time-budget", type=float, metavar="SECONDS",
+                        help="anytime solve: print each improving basket and stop after SECONDS")
+    parser.add_argument("--target-gap", type=float, metavar="FRACTION",
+                        help="anytime solve: stop once the basket is within FRACTION of the bound, e.g. 0.01")
+    parser.add_argument("--backend", choices=ShoppingModel.BACKENDS, default="pulp",
+                        help="pulp: CBC via an LP file; highs: HiGHS in-process via scipy")
+    parser.add_argument("--profile", metavar="JSON",
+                        help="answers as a JSON object or file instead of the questions "
+                             '(age, gender, weight, height, activity, goal, budget, optionally days)')
+    parser.add_argument("--targets", action="store_true",
+                        help="validate the profile, print the TDEE and macro targets and exit without solving")
+    parser.add_argument("--batch", metavar="JSONL",
+                        help='solve one profile per line of JSONL ("-" for stdin) and write one JSON result '
+                             'per line as each finishes, instead of asking the questions')
+    parser.add_argument("--output", metavar="PATH",
+                        help="append --batch results to PATH instead of writing them to stdout")
+    parser.add_argument("--catalog", default="enriched_2025_05_21.csv", help="catalog snapshot CSV")
+    parser.add_argument("--rules", metavar="JSON", default=RULES_PATH,
+                        help="exclusion keywords and product-class limits (default: rules.json)")
+    parser.add_argument("--previous-catalog", metavar="CSV",
+                        help="earlier snapshot whose compiled catalog --catalog is applied to as a diff")
+    parser.add_argument("--solution-cache", nargs="?", const=SOLUTION_CACHE_DIR, metavar="DIR",
+                        help=f"reuse baskets solved for near-identical targets (stored in DIR, default {SOLUTION_CACHE_DIR})")
+    parser.add_argument("--quiet", action="store_true",
+                        help="no progress output or solver log; only the questions and the shopping list")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help='append a JSON metrics record (stage timings, model size, solver stats) to PATH, or "-" for stdout (stderr with --batch)')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        use_rules(load_rules(args.rules))
+    except (OSError, ValueError) as e:
+        sys.exit(f"❌ Could not load rules: {e}")
+    profile = None
+    if args.profile:
+        try:
+            profile = load_profile(args.profile)
+        except (OSError, ValueError) as e:
+            sys.exit(f"❌ Invalid profile: {e}")
+    if args.metrics and not args.targets:
+        mode = ('batch' if args.batch else 'sweep' if args.sweep else 'weekly' if args.weekly
+                else 'refine' if args.refine else 'fast' if args.fast else 'exact')
+        start_metrics(mode=mode, backend=args.backend)
+    if args.batch:
+        batch_main(args)
+        return
     print("🚀 Starting Shopping Optimizer v2.0")
     
-    # Load and preprocess data
-    print("\n📂 Loading data...")
-    df = pd.read_csv("enriched_2025_05_21.csv")
-    df = preprocess_data(df)
+    # Load and preprocess data in the background while the questions are asked
+    catalog = None
+    if not args.targets:
+        with quiet_output(args.quiet):
+            print("\n📂 Loading data...")
+        catalog = BackgroundCatalog(args.catalog, args.previous_catalog)
     
     # Get user inputs
-    age, gender, weight, height, activity, goal, budget = get_user_input()
-    days = 30  # Fixed at 30 days
+    if profile:
+        age, gender, weight, height, activity, goal, budget, days = (
+            profile[field] for field in ('age', 'gender', 'weight', 'height', 'activity', 'goal', 'budget', 'days'))
+    else:
+        age, gender, weight, height, activity, goal, budget = get_user_input(
+            ask_budget=args.sweep is None and not args.targets)
+        days = 30  # Fixed at 30 days
     
     # Calculate nutrition targets
     tdee = calculate_tdee(age, gender, weight, height, activity)
@@ -569,13 +2832,69 @@ def main():
     print(f"  Protein: {protein_g*days:.0f} g")
     print(f"  Fat: {fat_g*days:.0f} g")
     print(f"  Carbs: {carb_g*days:.0f} g")
+    if args.targets:
+        return
+    df, offers = catalog.result(replay=not args.quiet)
+    
+    if args.sweep:
+        budgets, scales = args.sweep, args.scales
+        print(f"\n=== SWEEP: {len(budgets)} budgets x {len(scales)} target scales ===")
+        with quiet_output(args.quiet), span('sweep'):
+            rows = sweep(df, tdee, protein_g, fat_g, carb_g, budgets, scales, days, backend=args.backend)
+            save_frontier(rows, args.frontier)
+        record_metrics(points=len(rows), solved=sum(row['status'] == "Optimal" for row in rows))
+        if args.metrics:
+            write_metrics(args.metrics)
+        return
+    
+    if args.weekly:
+        with quiet_output(args.quiet), span('weekly'):
+            plan = optimize_weekly(df, tdee, protein_g, fat_g, carb_g, budget, days, workers=args.workers,
+                                   backend=args.backend, compare=True)
+        record_metrics(weekly=plan['summary'])
+        with span('display'):
+            display_weekly(plan, tdee, protein_g, fat_g, carb_g)
+        with quiet_output(args.quiet), span('save'):
+            with open("shopping_output.txt", "w", encoding="utf-8") as f, contextlib.redirect_stdout(f):
+                display_weekly(plan, tdee, protein_g, fat_g, carb_g)
+            print("💾 Results saved to shopping_output.txt")
+        if args.metrics:
+            write_metrics(args.metrics)
+        return
     
     # Run optimization
-    results = optimize_shopping(df, tdee, protein_g, fat_g, carb_g, budget, days)
+    solve = optimize_shopping
+    if args.solution_cache:
+        cache = SolutionCache(path=args.solution_cache)
+        solve = cache.optimize
+    with quiet_output(args.quiet):
+        results = solve(df, tdee, protein_g, fat_g, carb_g, budget, days,
+                        fast=args.fast or args.refine, backend=args.backend, msg=not args.quiet,
+                        shortlist=args.shortlist, time_budget=args.time_budget,
+                        target_gap=args.target_gap, on_incumbent=print_incumbent)
+        if args.solution_cache and results is not None:
+            if results['cache'] != 'hit' and not results.get('proven', True):
+                print("⚠️  Basket not proven optimal - not added to the solution cache")
+            else:
+                print({'hit': "♻️  Reused a cached basket for these targets",
+                       'warm': "♻️  Solved from a cached basket for similar targets",
+                       'miss': "💾 Basket added to the solution cache"}[results['cache']])
+            record_metrics(solution_cache=cache.stats())
+        if args.refine and results is not None:
+            results = optimize_shopping(df, tdee, protein_g, fat_g, carb_g, budget, days,
+                                        initial_solution=results, backend=args.backend, msg=not args.quiet)
+    if results is not None:
+        attach_offers(results, offers)
+        record_metrics(result={'total_cost': results['total_cost'], 'total_items': results['total_items'],
+                               'products': len(results['items'])})
     
     # Display and save results
-    display_results(results, budget, tdee, protein_g, fat_g, carb_g, days)
-    save_results_to_file(results, budget, tdee, protein_g, fat_g, carb_g, days)
+    with span('display'):
+        display_results(results, budget, tdee, protein_g, fat_g, carb_g, days)
+    with quiet_output(args.quiet), span('save'):
+        save_results_to_file(results, budget, tdee, protein_g, fat_g, carb_g, days)
+    if args.metrics:
+        write_metrics(args.metrics)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file